@@ -6,7 +6,6 @@ SUMOネットワークの実際の信号機IDとエッジIDの対応関係を調
 """
 
 import sys
-import traci
 import os
 
 # 設定ファイルをインポート
@@ -20,10 +19,12 @@ except ImportError as e:
         DEFAULT_SUMO_CONFIG = "../config/mixed_traffic.sumocfg"
     class SimulationConfig:
         SUMO_BINARY = "sumo"
-        SUMO_CMD_OPTIONS = ["--start", "--no-warnings", "--time-to-teleport", "-1"]
+        SUMO_CMD_OPTIONS = ("--start", "--no-warnings", "--time-to-teleport", "-1")
 
 def investigate_network_structure():
     """ネットワーク構造を調査"""
+    import traci
+
     try:
         # SUMO設定ファイルが存在するか確認
         config_file = PathConfig.DEFAULT_SUMO_CONFIG
@@ -34,7 +35,7 @@ def investigate_network_structure():
         print(f"🔍 SUMO設定ファイル: {config_file}")
         
         # SUMOを起動
-        sumo_cmd = [SimulationConfig.SUMO_BINARY, "-c", config_file] + SimulationConfig.SUMO_CMD_OPTIONS
+        sumo_cmd = [SimulationConfig.SUMO_BINARY, "-c", config_file, *SimulationConfig.SUMO_CMD_OPTIONS]
         print(f"🚀 SUMOコマンド: {' '.join(sumo_cmd)}")
         
         traci.start(sumo_cmd)
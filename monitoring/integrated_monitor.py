@@ -16,25 +16,30 @@ CO2排出量と停止回数を同時に監視し、車両数を動的に制御
 
 import os
 import sys
-import traci
 import time
 import csv
+import gc
 import signal
 import argparse
 import random
 from collections import defaultdict
 from datetime import datetime
+from typing import Optional
+
+import traci
+# 定数は常にソケット版traciパッケージから読み込む（libsumo使用時も値は同一）
+import traci.constants as tc
 
 # 設定ファイルをインポート
 try:
     from monitoring_config import (
         PathConfig, VehicleConfig, CO2MonitoringConfig, 
         StopMonitoringConfig, SimulationConfig, ReportConfig,
-        DebugConfig, OutputConfig, validate_config
+        DebugConfig, OutputConfig, validate_config, make_sumo_argv
     )
     # AV信号予測設定をインポート（新機能）
     try:
-        from monitoring_config import AVSignalConfig
+        from monitoring_config import AVSignalConfig, edge_of_lane
         AV_SIGNAL_ENABLED = True
     except ImportError:
         AV_SIGNAL_ENABLED = False
@@ -44,45 +49,165 @@ except ImportError as e:
     print("monitoring_config.py が同じディレクトリにあることを確認してください")
     sys.exit(1)
 
+# サブスクリプションで毎ステップ一括取得する変数
+VEHICLE_SUBSCRIPTION_VARS = (tc.VAR_ROAD_ID, tc.VAR_SPEED, tc.VAR_LANE_ID, tc.VAR_CO2EMISSION, tc.VAR_TYPE)
+SIMULATION_SUBSCRIPTION_VARS = (tc.VAR_TIME, tc.VAR_DEPARTED_VEHICLES_IDS, tc.VAR_ARRIVED_VEHICLES_IDS)
+SIGNAL_SUBSCRIPTION_VARS = (tc.TL_RED_YELLOW_GREEN_STATE, tc.TL_CURRENT_PHASE, tc.TL_NEXT_SWITCH)
+
+# 実際のSUMOネットワークで判明した道路→信号機の対応関係（道路IDは整数）
+_ROAD_TO_SIGNAL = {
+    1: 'J1',
+    2: '1682382343',
+    3: '818521964',
+    4: '818520867',
+    5: 'J0',
+    6: 'cluster_2579637038_818520857',
+    7: '818520813',
+    8: '1717000300',
+    9: '1846875078',
+    10: '818520784',
+    11: '1818759484',
+    12: '8154759359',
+    -1: 'J13',
+    -2: '8154759359',
+    -3: '1818759484',
+    -4: '818520784',
+    -5: '1846875078',
+    -6: '1717000300',
+    -7: '818520813',
+    -8: 'cluster_2579637038_818520857',
+    -9: 'J0',
+    -10: '818520867',
+    -11: '818521964',
+    -12: '1682382343',
+}
+
+class StopState:
+    """停止中の車両1台分の状態（車両ごとに保持するため__slots__で軽量化）"""
+    __slots__ = ('start_time', 'edge', 'counted')
+    
+    def __init__(self, start_time, edge, counted=False):
+        self.start_time = start_time
+        self.edge = edge
+        self.counted = counted
+
+class CsvLogStream:
+    """実行中に1行ずつ書き出すCSVログ（行をメモリに溜めない）"""
+    
+    def __init__(self, path: Optional[str], fieldnames):
+        """初期化（ファイルは最初の書き込み時に開く、pathがNoneなら書き出さない）"""
+        self.path = path
+        self.fieldnames = tuple(fieldnames)
+        self.row_count = 0
+        self.failed = False
+        self._file = None
+        self._writer = None
+    
+    def open(self):
+        """ファイルを開いてヘッダーを書き込む（既に開いている場合は何もしない）"""
+        if self._file is None:
+            self._file = open(self.path, 'w', newline=OutputConfig.CSV_NEWLINE,
+                              encoding=OutputConfig.CSV_ENCODING)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(self.fieldnames)
+    
+    def writerow(self, row):
+        """fieldnamesと同じ順序の値を1行追記"""
+        if self.path is None or self.failed:
+            return
+        try:
+            if self._writer is None:
+                self.open()
+            self._writer.writerow(row)
+        except OSError as e:
+            # 書き込めなくなった場合も監視自体は継続する
+            self.failed = True
+            print(f"⚠️ CSVログ書き込みエラー ({self.path}): {e}")
+            return
+        self.row_count += 1
+    
+    def close(self):
+        """ファイルを閉じる"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+class AVPredictionLog:
+    """AV信号予測ログ（各行はCSVへ逐次書き出し、統計は追加時に逐次集計）"""
+    
+    FIELDS = (
+        'time', 'vehicle_id', 'current_edge', 'signal_id',
+        'time_to_green', 'time_to_red', 'lane_length', 'green_duration',
+        'optimal_speed', 'previous_speed', 'speed_change', 'current_speed_ms'
+    )
+    
+    # 集計対象の項目（speed_change は絶対値で集計）
+    STAT_FIELDS = (
+        'time_to_green', 'time_to_red', 'lane_length',
+        'green_duration', 'optimal_speed', 'speed_change'
+    )
+    
+    def __init__(self, csv_path: Optional[str] = None):
+        """初期化"""
+        self.count = 0
+        self.sums = dict.fromkeys(self.STAT_FIELDS, 0.0)
+        self.mins = dict.fromkeys(self.STAT_FIELDS, float('inf'))
+        self.maxs = dict.fromkeys(self.STAT_FIELDS, float('-inf'))
+        # 道路別統計は件数と項目ごとの合計のみ保持（値そのものは保持しない）
+        self.edge_stats = defaultdict(lambda: {'count': 0, 'sums': dict.fromkeys(self.STAT_FIELDS, 0.0)})
+        self.stream = CsvLogStream(csv_path, self.FIELDS)
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def append(self, **record):
+        """1件分の予測結果をCSVへ書き出し、統計を更新"""
+        self.stream.writerow(tuple(record[field] for field in self.FIELDS))
+        self.count += 1
+        
+        values = (
+            record['time_to_green'], record['time_to_red'], record['lane_length'],
+            record['green_duration'], record['optimal_speed'], abs(record['speed_change'])
+        )
+        sums, mins, maxs = self.sums, self.mins, self.maxs
+        for field, value in zip(self.STAT_FIELDS, values):
+            sums[field] += value
+            if value < mins[field]:
+                mins[field] = value
+            if value > maxs[field]:
+                maxs[field] = value
+        
+        edge_stats = self.edge_stats[record['current_edge']]
+        edge_stats['count'] += 1
+        edge_sums = edge_stats['sums']
+        for field, value in zip(self.STAT_FIELDS, values):
+            edge_sums[field] += value
+    
+    def mean(self, field: str) -> float:
+        """集計項目の平均値"""
+        return self.sums[field] / self.count
+
 class AVSignalPredictor:
     """AV車向け先読み信号予測クラス"""
     
+    C = 90  # サイクル長[s]
+    VJ_KMH = 60  # 法定速度[km/h]
+    VJ_MS = VJ_KMH / 3.6  # 法定速度[m/s]
+    
     def __init__(self):
         """初期化"""
         self.direction_cache = {}  # 信号方向インデックスのキャッシュ
+        self.subscribed_signals = set()  # サブスクライブ済み信号機
+        self.program_cache = {}  # 信号プログラム（フェーズ列）のキャッシュ
+        self.phase_tables = {}  # (信号機ID, 信号インデックス) ごとのフェーズ別オフセット表
+        self._lane_len_cache = {}  # レーンID → レーン長（ネットワークは実行中不変）
         self.verbose = DebugConfig.VERBOSE_MODE
+        self._penetration_debug_shown = False  # AV普及率のデバッグ表示済みフラグ
     
     def get_signal_id_for_road(self, current_edge_id: int) -> str:
         """現在の道路IDから対応する信号機IDを取得（実際のSUMOネットワークに基づく）"""
-        # 実際のSUMOネットワークで判明した道路→信号機の対応関係
-        road_to_signal_map = {
-            '1': 'J1',
-            '2': '1682382343',
-            '3': '818521964',
-            '4': '818520867',
-            '5': 'J0',
-            '6': 'cluster_2579637038_818520857',
-            '7': '818520813',
-            '8': '1717000300',
-            '9': '1846875078',
-            '10': '818520784',
-            '11': '1818759484',
-            '12': '8154759359',
-            '-1': 'J13',
-            '-2': '8154759359',
-            '-3': '1818759484',
-            '-4': '818520784',
-            '-5': '1846875078',
-            '-6': '1717000300',
-            '-7': '818520813',
-            '-8': 'cluster_2579637038_818520857',
-            '-9': 'J0',
-            '-10': '818520867',
-            '-11': '818521964',
-            '-12': '1682382343',
-        }
-        
-        signal_id = road_to_signal_map.get(str(current_edge_id))
+        signal_id = _ROAD_TO_SIGNAL.get(current_edge_id)
         if not signal_id:
             if self.verbose:
                 print(f"⚠️ 道路{current_edge_id}に対応する信号機が見つかりません")
@@ -90,9 +215,28 @@ class AVSignalPredictor:
         
         return signal_id
     
+    def get_signal_state(self, signal_id: str) -> tuple:
+        """信号機の (状態文字列, 現在フェーズ, 次の切替時刻) をサブスクリプション経由で取得"""
+        if signal_id not in self.subscribed_signals:
+            # 初回のみサブスクライブ（以降はsimulationStepごとに一括更新される）
+            traci.trafficlight.subscribe(signal_id, SIGNAL_SUBSCRIPTION_VARS)
+            self.subscribed_signals.add(signal_id)
+        
+        results = traci.trafficlight.getSubscriptionResults(signal_id)
+        return (results[tc.TL_RED_YELLOW_GREEN_STATE],
+                results[tc.TL_CURRENT_PHASE],
+                results[tc.TL_NEXT_SWITCH])
+    
+    def _get_phases(self, signal_id: str):
+        """信号プログラムのフェーズ列を取得（プログラムは実行中不変のためキャッシュ）"""
+        if signal_id not in self.program_cache:
+            programs = traci.trafficlight.getCompleteRedYellowGreenDefinition(signal_id)
+            self.program_cache[signal_id] = programs[0].phases if programs else ()
+        return self.program_cache[signal_id]
+    
     def get_signal_direction_index(self, junction_id: str, edge_id: int) -> int:
         """進行方向に対応する信号インデックスを取得"""
-        cache_key = f"{junction_id}_{edge_id}"
+        cache_key = (junction_id, edge_id)
         
         if cache_key in self.direction_cache:
             return self.direction_cache[cache_key]
@@ -106,16 +250,16 @@ class AVSignalPredictor:
             
             # 進行方向に対応するレーンインデックスを探す
             for i, lane in enumerate(controlled_lanes):
-                try:
-                    lane_edge_id = int(lane.split('_')[0])
-                    
-                    if (is_positive_direction and lane_edge_id > 0) or \
-                       (not is_positive_direction and lane_edge_id < 0):
-                        signal_index = i % 4  # 通常は4方向（NSEW）
-                        self.direction_cache[cache_key] = signal_index
-                        return signal_index
-                except (ValueError, IndexError):
-                    continue
+                lane_edge = edge_of_lane(lane)
+                if lane_edge is None:
+                    continue  # 監視対象外の道路（内部レーン等）は判定に使わない
+                lane_edge_id = int(lane_edge)
+                
+                if (is_positive_direction and lane_edge_id > 0) or \
+                   (not is_positive_direction and lane_edge_id < 0):
+                    signal_index = i % 4  # 通常は4方向（NSEW）
+                    self.direction_cache[cache_key] = signal_index
+                    return signal_index
             
             # デフォルト：正方向=0, 逆方向=2
             default_index = 0 if is_positive_direction else 2
@@ -127,64 +271,109 @@ class AVSignalPredictor:
                 print(f"⚠️ 信号方向取得エラー {junction_id}: {e}")
             return 0 if edge_id > 0 else 2
     
+    @staticmethod
+    def _build_phase_table(phases, signal_index: int) -> dict:
+        """
+        1方向分のフェーズ別オフセット表を構築
+        
+        各リストは現在フェーズ番号で引き、「次の切替までの残り時間」に
+        加算する秒数を返す（フェーズ列は実行中不変のため一度だけ計算）
+        """
+        n = len(phases)
+        durations = [phase.duration for phase in phases]
+        is_green = [signal_index < len(phase.state) and phase.state[signal_index].upper() == 'G'
+                    for phase in phases]
+        is_yellow = [signal_index < len(phase.state) and phase.state[signal_index].upper() == 'Y'
+                     for phase in phases]
+        
+        green_if_green = []  # 現在青: 次回の青開始まで
+        green_if_other = []  # 現在赤/黄: 次の青開始まで
+        red_if_red = []      # 現在赤: 次の青（+直後の黄）の終了まで
+        red_if_green = []    # 現在青: 直後の黄の終了まで
+        
+        for current_phase in range(n):
+            first = (current_phase + 1) % n
+            
+            # 現在青の場合：現在フェーズ以外で次に青になるフェーズを探す（無ければ0）
+            offset = 0.0
+            accumulated = 0.0
+            idx = first
+            while idx != current_phase:
+                if is_green[idx]:
+                    offset = accumulated
+                    break
+                accumulated += durations[idx]
+                idx = (idx + 1) % n
+            green_if_green.append(offset)
+            
+            # 現在赤/黄の場合：1周分（現在フェーズを含む）探索、無ければ1周分の合計
+            accumulated = 0.0
+            for step in range(n):
+                idx = (first + step) % n
+                if is_green[idx]:
+                    break
+                accumulated += durations[idx]
+            green_if_other.append(accumulated)
+            
+            # 現在赤の場合：次の青フェーズと直後の黄フェーズの終了まで
+            accumulated = 0.0
+            idx = first
+            while idx != current_phase:
+                if is_green[idx]:
+                    accumulated += durations[idx]
+                    yellow_idx = (idx + 1) % n
+                    if is_yellow[yellow_idx]:
+                        accumulated += durations[yellow_idx]
+                    break
+                accumulated += durations[idx]
+                idx = (idx + 1) % n
+            red_if_red.append(accumulated)
+            
+            # 現在青の場合：次のフェーズが黄ならその時間
+            red_if_green.append(durations[first] if is_yellow[first] else 0.0)
+        
+        # 信号サイクルの最初の青フェーズの時間
+        first_green_duration = next((durations[i] for i in range(n) if is_green[i]), 0.0)
+        
+        return {
+            'green_if_green': green_if_green,
+            'green_if_other': green_if_other,
+            'red_if_red': red_if_red,
+            'red_if_green': red_if_green,
+            'first_green_duration': first_green_duration,
+        }
+    
+    def _get_phase_table(self, signal_id: str, signal_index: int):
+        """フェーズ別オフセット表を取得（初回のみ構築、信号プログラムが無い場合はNone）"""
+        key = (signal_id, signal_index)
+        if key not in self.phase_tables:
+            phases = self._get_phases(signal_id)
+            self.phase_tables[key] = self._build_phase_table(phases, signal_index) if phases else None
+        return self.phase_tables[key]
+    
     def calculate_time_to_green(self, junction_id: str, signal_index: int) -> float:
         """指定方向の信号が次に青になるまでの時間を計算"""
         try:
             # 現在の信号状態を取得
-            current_state = traci.trafficlight.getRedYellowGreenState(junction_id)
-            current_phase = traci.trafficlight.getPhase(junction_id)
-            time_to_next_switch = traci.trafficlight.getNextSwitch(junction_id) - traci.simulation.getTime()
+            current_state, current_phase, next_switch = self.get_signal_state(junction_id)
+            time_to_next_switch = next_switch - traci.simulation.getTime()
             
-            # 信号プログラム定義を取得
-            programs = traci.trafficlight.getCompleteRedYellowGreenDefinition(junction_id)
+            # フェーズ別オフセット表を取得
+            table = self._get_phase_table(junction_id, signal_index)
             
-            if not programs:
+            if table is None:
                 return 0.0
             
-            current_program = programs[0]
-            phases = current_program.phases
-            
             if signal_index >= len(current_state):
                 return 0.0
             
             # 現在の信号状態をチェック
-            current_signal = current_state[signal_index]
-            
-            if current_signal.upper() == 'G':
-                # 既に青の場合は次回の青まで計算
-                accumulated_time = time_to_next_switch
-                next_phase_idx = (current_phase + 1) % len(phases)
-                
-                while next_phase_idx != current_phase:
-                    phase = phases[next_phase_idx]
-                    phase_state = phase.state
-                    
-                    if signal_index < len(phase_state) and phase_state[signal_index].upper() == 'G':
-                        return accumulated_time
-                    
-                    accumulated_time += phase.duration
-                    next_phase_idx = (next_phase_idx + 1) % len(phases)
-                
-                return time_to_next_switch
+            if current_state[signal_index].upper() == 'G':
+                # 既に青の場合は次回の青まで
+                return time_to_next_switch + table['green_if_green'][current_phase]
             else:
-                # 赤または黄の場合、次の青を探す
-                accumulated_time = time_to_next_switch
-                next_phase_idx = (current_phase + 1) % len(phases)
-                
-                while True:
-                    phase = phases[next_phase_idx]
-                    phase_state = phase.state
-                    
-                    if signal_index < len(phase_state) and phase_state[signal_index].upper() == 'G':
-                        return accumulated_time
-                    
-                    accumulated_time += phase.duration
-                    next_phase_idx = (next_phase_idx + 1) % len(phases)
-                    
-                    if next_phase_idx == (current_phase + 1) % len(phases):
-                        break
-                
-                return accumulated_time
+                # 赤または黄の場合、次の青まで
+                return time_to_next_switch + table['green_if_other'][current_phase]
                 
         except Exception as e:
             if self.verbose:
@@ -195,70 +384,30 @@ class AVSignalPredictor:
         """指定方向の信号が次に赤になるまでの時間を計算"""
         try:
             # 現在の信号状態を取得
-            current_state = traci.trafficlight.getRedYellowGreenState(signal_id)
-            current_phase = traci.trafficlight.getPhase(signal_id)
-            time_to_next_switch = traci.trafficlight.getNextSwitch(signal_id) - traci.simulation.getTime()
+            current_state, current_phase, next_switch = self.get_signal_state(signal_id)
+            time_to_next_switch = next_switch - traci.simulation.getTime()
             
-            # 信号プログラム定義を取得
-            programs = traci.trafficlight.getCompleteRedYellowGreenDefinition(signal_id)
+            # フェーズ別オフセット表を取得
+            table = self._get_phase_table(signal_id, signal_index)
             
-            if not programs:
+            if table is None:
                 return 0.0
             
-            current_program = programs[0]
-            phases = current_program.phases
-            
             if signal_index >= len(current_state):
                 return 0.0
             
             # 現在の信号状態をチェック
-            current_signal = current_state[signal_index]
+            current_signal = current_state[signal_index].upper()
             
-            if current_signal.upper() == 'R':
-                # 既に赤の場合：次の青フェーズ + その青フェーズの終了まで
-                accumulated_time = time_to_next_switch
-                next_phase_idx = (current_phase + 1) % len(phases)
-                
-                # 次の青フェーズを探す
-                while next_phase_idx != current_phase:
-                    phase = phases[next_phase_idx]
-                    phase_state = phase.state
-                    
-                    if signal_index < len(phase_state) and phase_state[signal_index].upper() == 'G':
-                        # 青フェーズが見つかった - この青フェーズの終了時間まで加算
-                        accumulated_time += phase.duration
-                        
-                        # この青フェーズの次を確認（黄があるかも）
-                        yellow_phase_idx = (next_phase_idx + 1) % len(phases)
-                        if yellow_phase_idx < len(phases):
-                            yellow_phase = phases[yellow_phase_idx]
-                            if signal_index < len(yellow_phase.state) and yellow_phase.state[signal_index].upper() == 'Y':
-                                accumulated_time += yellow_phase.duration
-                        
-                        return accumulated_time
-                    
-                    accumulated_time += phase.duration
-                    next_phase_idx = (next_phase_idx + 1) % len(phases)
-                
-                return accumulated_time
-                
-            elif current_signal.upper() == 'G':
+            if current_signal == 'R':
+                # 既に赤の場合：次の青フェーズ + その青フェーズ（と直後の黄）の終了まで
+                return time_to_next_switch + table['red_if_red'][current_phase]
+            elif current_signal == 'G':
                 # 現在青の場合：青の残り時間 + 黄色時間
-                accumulated_time = time_to_next_switch
-                
-                # 次のフェーズが黄色かチェック
-                next_phase_idx = (current_phase + 1) % len(phases)
-                if next_phase_idx < len(phases):
-                    next_phase = phases[next_phase_idx]
-                    if signal_index < len(next_phase.state) and next_phase.state[signal_index].upper() == 'Y':
-                        accumulated_time += next_phase.duration
-                
-                return accumulated_time
-                
-            elif current_signal.upper() == 'Y':
+                return time_to_next_switch + table['red_if_green'][current_phase]
+            elif current_signal == 'Y':
                 # 現在黄の場合：黄の残り時間
                 return time_to_next_switch
-                
             else:
                 return 0.0
                 
@@ -270,35 +419,26 @@ class AVSignalPredictor:
     def get_green_phase_duration(self, signal_id: str, signal_index: int) -> float:
         """信号サイクルの最初の青フェーズの時間を取得"""
         try:
-            # 信号プログラム定義を取得
-            programs = traci.trafficlight.getCompleteRedYellowGreenDefinition(signal_id)
-            
-            if not programs:
-                return 0.0
-            
-            current_program = programs[0]
-            phases = current_program.phases
-            
-            # 最初の青フェーズを探す
-            for phase in phases:
-                if signal_index < len(phase.state) and phase.state[signal_index].upper() == 'G':
-                    return phase.duration
-            
-            return 0.0
+            table = self._get_phase_table(signal_id, signal_index)
+            return table['first_green_duration'] if table else 0.0
             
         except Exception as e:
             if self.verbose:
                 print(f"⚠️ {signal_id}の青フェーズ時間取得エラー: {e}")
             return 0.0
     
-    def get_lane_length(self, vehicle_id: str) -> float:
+    def get_lane_length(self, vehicle_id: str, current_lane: Optional[str] = None) -> float:
         """車両が現在いるレーンの長さを取得"""
         try:
-            # 車両の現在のレーンIDを取得
-            current_lane = traci.vehicle.getLaneID(vehicle_id)
+            # 車両の現在のレーンIDを取得（サブスクリプション結果があればそれを使用）
+            if current_lane is None:
+                current_lane = traci.vehicle.getLaneID(vehicle_id)
             
-            # レーンの長さを取得（メートル単位）
-            length = traci.lane.getLength(current_lane)
+            # レーンの長さを取得（メートル単位、初回のみTraCIに問い合わせ）
+            length = self._lane_len_cache.get(current_lane)
+            if length is None:
+                length = traci.lane.getLength(current_lane)
+                self._lane_len_cache[current_lane] = length
             return length
             
         except Exception as e:
@@ -306,6 +446,32 @@ class AVSignalPredictor:
                 print(f"⚠️ 車両{vehicle_id}のレーン長取得エラー: {e}")
             return 0.0
     
+    @staticmethod
+    def _decide_speed(L: float, P: float, S: float, R: float, G: float) -> Optional[float]:
+        """
+        速度決定ロジックの数値計算部分（km/h、副作用なし）
+        
+        ゼロ除算の恐れがある不正な信号情報の場合は None を返す
+        """
+        C = AVSignalPredictor.C
+        vj = AVSignalPredictor.VJ_KMH
+        T = G * P  # 閾値[s]
+        
+        # ゼロ除算防止のためのガード条件
+        if S <= 0.1 or R <= 0.1 or L <= 0.1 or G <= 0:
+            return None
+        
+        if R <= T:  # （青）次の信号に合わせると遅すぎるから法定速度で走る
+            return vj
+        elif (L / S) * 3.6 <= vj:  # 次の青にビタで入るように走る
+            return (L / S) * 3.6
+        elif (L / R) * 3.6 <= vj:  # 次の信号に合わせると遅すぎるから法定速度で走る
+            return vj
+        elif S + C > 0.1:  # 次の青に合わせようとすると法定速度守れないから、次の青のビタに合わせる
+            return (L / (S + C)) * 3.6
+        else:
+            return vj  # フォールバック
+    
     def calculate_speed(self, L: float, P: float, S: float, R: float, G: float) -> float:
         """
         交通信号制御における車両の最適速度を決定する関数
@@ -320,30 +486,16 @@ class AVSignalPredictor:
         Returns:
         float: 決定された速度（km/h）
         """
-        C = 90  # サイクル長[s]
-        vj = 60  # 法定速度[km/h]
-        T = G * P  # 閾値[s]
+        vj = self.VJ_KMH
         
-        # ゼロ除算防止のためのガード条件
-        if S <= 0.1 or R <= 0.1 or L <= 0.1 or G <= 0:
+        v = self._decide_speed(L, P, S, R, G)
+        
+        if v is None:
             # 信号情報が不正な場合は法定速度で走行
             if self.verbose:
                 print(f"⚠️ 信号情報不正 (S:{S:.1f}, R:{R:.1f}, L:{L:.1f}, G:{G:.1f}) → 法定速度{vj}km/h使用")
             return vj
         
-        # 速度決定ロジック
-        if R <= T:  # （青）次の信号に合わせると遅すぎるから法定速度で走る
-            v = vj
-        elif (L / S) * 3.6 <= vj:  # 次の青にビタで入るように走る
-            v = (L / S) * 3.6
-        elif (L / R) * 3.6 <= vj:  # 次の信号に合わせると遅すぎるから法定速度で走る
-            v = vj
-        else:  # 次の青に合わせようとすると法定速度守れないから、次の青のビタに合わせる
-            if S + C > 0.1:  # ゼロ除算防止
-                v = (L / (S + C)) * 3.6
-            else:
-                v = vj  # フォールバック
-        
         # 計算結果の妥当性チェック
         if v <= 0 or v > 100:  # 0以下または100km/h超過の場合
             if self.verbose:
@@ -352,10 +504,15 @@ class AVSignalPredictor:
         
         return v
     
-    def get_signal_timing_with_speed_control(self, vehicle_id: str, current_edge_id: int, av_penetration: float) -> tuple:
+    def get_signal_timing_with_speed_control(self, vehicle_id: str, current_edge_id: int, av_penetration: float,
+                                             current_lane: Optional[str] = None,
+                                             current_speed_ms: Optional[float] = None) -> tuple:
         """
         AV車が現在の道路から完全な信号タイミング情報を取得し、最適速度を車両に適用
         
+        current_lane / current_speed_ms にサブスクリプション結果を渡すと、
+        車両ごとのgetLaneID/getSpeed呼び出しを省略する
+        
         Returns:
             tuple: (S, R, L, G, V, current_speed)
             - S: 青信号までの時間（秒）
@@ -381,14 +538,15 @@ class AVSignalPredictor:
         R = self.calculate_time_to_red(signal_id, signal_index)
         
         # レーンの長さを取得（L）
-        L = self.get_lane_length(vehicle_id)
+        L = self.get_lane_length(vehicle_id, current_lane)
         
         # 青信号の設定時間を取得（G）
         G = self.get_green_phase_duration(signal_id, signal_index)
         
         # 現在の車両速度を取得（制御前）
         try:
-            current_speed_ms = traci.vehicle.getSpeed(vehicle_id)  # m/s
+            if current_speed_ms is None:
+                current_speed_ms = traci.vehicle.getSpeed(vehicle_id)  # m/s
             current_speed_kmh = current_speed_ms * 3.6  # km/h
         except:
             current_speed_kmh = 0.0
@@ -397,14 +555,14 @@ class AVSignalPredictor:
         V = self.calculate_speed(L, av_penetration, S, R, G)
         
         # デバッグ: 普及率の値を確認（初回のみ表示）
-        if not hasattr(self, '_penetration_debug_shown'):
+        if self.verbose and not self._penetration_debug_shown:
             self._penetration_debug_shown = True
-            if self.verbose:
-                print(f"🔧 デバッグ: AV普及率P = {av_penetration:.3f} (速度計算で使用)")
+            print(f"🔧 デバッグ: AV普及率P = {av_penetration:.3f} (速度計算で使用)")
         
         # 計算された速度を車両に適用
         try:
-            optimal_speed_ms = V / 3.6  # km/h → m/s変換
+            # km/h → m/s変換（法定速度の場合は事前計算値を使用）
+            optimal_speed_ms = self.VJ_MS if V == self.VJ_KMH else V / 3.6
             traci.vehicle.setSpeed(vehicle_id, optimal_speed_ms)
             
             if self.verbose:
@@ -461,65 +619,101 @@ class AVSignalPredictor:
         S, R = self.get_signal_timing(vehicle_id, current_edge_id)
         return S
 
+# 設定検証とログディレクトリ作成はプロセス内で一度だけ行う（複数インスタンス生成時の重複を防ぐ）
+_CONFIG_VALIDATED = False
+_ENSURED_LOG_DIRS = {}  # 指定されたログディレクトリ → 実際に使用するディレクトリ
+
+def ensure_config_valid():
+    """設定値を検証し、エラーがあれば内容を表示して終了（プロセス内で初回のみ）"""
+    global _CONFIG_VALIDATED
+    if _CONFIG_VALIDATED:
+        return
+    config_errors = validate_config()
+    if config_errors:
+        print("❌ 設定エラーが検出されました:")
+        for error in config_errors:
+            print(f"   - {error}")
+        sys.exit(1)
+    _CONFIG_VALIDATED = True
+
 class IntegratedMonitor:
     """
     CO2排出量と停止回数を同時に監視し、車両数を動的制御するクラス
     + AV車信号予測機能
     """
     
-    def __init__(self):
-        """初期化"""
-        # 設定値検証
-        config_errors = validate_config()
-        if config_errors:
-            print("❌ 設定エラーが検出されました:")
-            for error in config_errors:
-                print(f"   - {error}")
-            sys.exit(1)
+    def __init__(self, log_dir: Optional[str] = None, show_status: bool = True,
+                 status_buffer_lines: Optional[int] = None):
+        """
+        初期化
+        
+        Args:
+            log_dir: ログ出力ディレクトリ（省略時は PathConfig.LOG_DIR）
+            show_status: 実行中の状況表示を出力するか（--quiet で無効）
+            status_buffer_lines: 状況表示をまとめて書き出す行数（省略時は OutputConfig.STATUS_BUFFER_LINES）
+        """
+        # 設定値検証（初回のみ）
+        ensure_config_valid()
         
         # ===== 基本設定 =====
-        self.log_dir = PathConfig.LOG_DIR
+        self.log_dir = log_dir or PathConfig.LOG_DIR
         self.ensure_log_directory()
         
         # ===== CO2監視関連 =====
-        self.vehicle_types = {}
-        self.co2_emissions = defaultdict(float)
-        self.vehicle_distances = defaultdict(float)
+        self.av_vehicle_ids = set()  # 走行中（出発待ちを含む）のAV車両ID
+        self.current_vehicles = set()  # 走行中の車両ID（出発・到着リストから差分更新）
+        self.vehicle_data = {}  # 今ステップのサブスクリプション結果（車両ID → 変数値）
+        self.vehicle_counts_by_type = {}  # 今ステップの走行中車両のタイプ別台数
         self.total_co2 = 0.0
         self.gasoline_co2 = 0.0
         self.av_co2 = 0.0
-        self.emission_log = []
+        self.emission_log = CsvLogStream(
+            os.path.join(self.log_dir, PathConfig.CO2_EMISSION_LOG_CSV),
+            ('time', 'gasoline_co2', 'av_co2', 'total_gasoline',
+             'total_av', 'gasoline_vehicles', 'av_vehicles')
+        )
         
         # ===== 停止回数監視関連 =====
-        self.target_edges = StopMonitoringConfig.TARGET_EDGES
+        self.target_edges = StopMonitoringConfig.TARGET_EDGES_SET
         self.stop_threshold = StopMonitoringConfig.STOP_SPEED_THRESHOLD
         self.min_stop_duration = StopMonitoringConfig.MIN_STOP_DURATION
         self.check_interval = StopMonitoringConfig.CHECK_INTERVAL
         
         self.stop_counts = defaultdict(int)
+        self.total_stops = 0  # stop_countsの合計（停止カウント時に加算）
         self.vehicle_stop_states = {}
-        self.valid_stop_edges = []
-        self.stop_events = []
+        self.valid_stop_edges = frozenset()
+        self.stop_events = CsvLogStream(
+            os.path.join(self.log_dir, PathConfig.STOP_COUNT_DETAILED_CSV),
+            ('time', 'vehicle_id', 'edge_id', 'duration', 'total_count')
+        )
         
         # ===== 動的車両制御関連 =====
         self.target_vehicle_count = 0  # 目標車両数（0で制御無効）
         self.target_av_penetration = 0.5  # 目標AV普及率
-        self.valid_vehicle_edges = []  # 車両生成用有効エッジ
+        self.valid_vehicle_edges = ()  # 車両生成用有効エッジ
+        self._route_cache = {}  # (出発エッジ, 目的エッジ) → ルートID（経路なしはNone）
+        self.route_pool = []  # 車両追加で使い回すルートID（ROUTE_POOL_SIZE設定時のみ）
         self.vehicle_id_counter = 2000  # 新規車両ID用カウンター
         self.last_vehicle_control_time = 0  # 最後の制御時刻
         
         # ===== AV信号予測関連（新機能） =====
         if AV_SIGNAL_ENABLED:
             self.signal_predictor = AVSignalPredictor()
-            self.av_signal_predictions = []  # AV信号予測ログ
-            self.av_vehicles_tracked = set()  # 追跡済みAV車両
-            self.target_road_edges = getattr(AVSignalConfig, 'TARGET_ROAD_EDGES', [])
+            av_csv_name = getattr(PathConfig, 'AV_SIGNAL_PREDICTIONS_CSV', "av_signal_predictions.csv")
+            self.av_signal_predictions = AVPredictionLog(os.path.join(self.log_dir, av_csv_name))  # AV信号予測ログ
+            self.av_vehicles_tracked = {}  # 追跡済みAV車両: 車両ID → 予測済み道路IDの集合
+            self.target_road_edges = getattr(AVSignalConfig, 'TARGET_ROAD_EDGES_SET', frozenset())
+            self._edge_to_int = {}  # 対象道路ID → 数値の道路ID（initialize_monitoringで構築）
+            self._show_rt = getattr(AVSignalConfig, 'SHOW_REAL_TIME_PREDICTIONS', False)  # リアルタイム表示
             print("✅ AV信号予測機能が有効です")
         else:
             self.signal_predictor = None
-            self.av_signal_predictions = []
-            self.av_vehicles_tracked = set()
-            self.target_road_edges = []
+            self.av_signal_predictions = AVPredictionLog()
+            self.av_vehicles_tracked = {}
+            self.target_road_edges = frozenset()
+            self._edge_to_int = {}
+            self._show_rt = False
         
         # ===== シミュレーション管理 =====
         self.step_count = 0
@@ -527,13 +721,22 @@ class IntegratedMonitor:
         self.start_datetime = datetime.now()
         self.total_vehicles_seen = set()
         self.max_simultaneous_vehicles = 0
+        self._status_buf = []  # 書き出し待ちの状況表示行
+        self._status_buffer_lines = max(1, status_buffer_lines or OutputConfig.STATUS_BUFFER_LINES)
+        self._status_enabled = show_status and (sys.stdout.isatty() or not OutputConfig.STATUS_TTY_ONLY)
+        self._av_averages = None  # 保存時に1回だけ計算するAV信号予測の平均値
         
         if DebugConfig.VERBOSE_MODE:
             av_status = "有効" if AV_SIGNAL_ENABLED else "無効"
             print(f"✅ 統合監視システム初期化完了（AV信号予測: {av_status}）")
     
     def ensure_log_directory(self):
-        """ログディレクトリ確保"""
+        """ログディレクトリ確保（ディレクトリごとに初回のみ作成）"""
+        requested_dir = self.log_dir
+        if requested_dir in _ENSURED_LOG_DIRS:
+            self.log_dir = _ENSURED_LOG_DIRS[requested_dir]
+            return
+        
         try:
             os.makedirs(self.log_dir, exist_ok=True)
             if DebugConfig.VERBOSE_MODE:
@@ -541,6 +744,8 @@ class IntegratedMonitor:
         except Exception as e:
             print(f"⚠️ ログディレクトリ作成エラー: {e}")
             self.log_dir = "."  # フォールバック
+        
+        _ENSURED_LOG_DIRS[requested_dir] = self.log_dir
     
     def set_vehicle_control_params(self, total_vehicles, av_penetration):
         """動的車両制御パラメータを設定"""
@@ -552,29 +757,108 @@ class IntegratedMonitor:
             print(f"   目標車両数: {self.target_vehicle_count}")
             print(f"   目標AV普及率: {self.target_av_penetration:.1%}")
     
-    def get_valid_vehicle_edges(self):
-        """車両生成用の有効エッジを取得"""
-        try:
-            all_edges = traci.edge.getIDList()
-            valid_edges = []
-            
-            for edge_id in all_edges:
-                # 内部エッジや特殊エッジを除外
-                if not edge_id.startswith(':') and len(edge_id) > 1:
-                    # 逆方向エッジ（-で始まる）も含める
-                    valid_edges.append(edge_id)
-            
-            if DebugConfig.VERBOSE_MODE:
-                print(f"🛣️ 車両生成用エッジ数: {len(valid_edges)}")
-            
-            return valid_edges
-        except Exception as e:
-            print(f"⚠️ 車両用エッジ取得エラー: {e}")
-            return []
+    def get_valid_vehicle_edges(self, edge_ids):
+        """車両生成用の有効エッジを取得（edge_idsはネットワークの全エッジID）"""
+        # 内部エッジや特殊エッジを除外（逆方向エッジ（-で始まる）も含める）
+        # random.choice で毎回引くだけなので変更不可のタプルで保持
+        valid_edges = tuple(edge_id for edge_id in edge_ids
+                            if not edge_id.startswith(':') and len(edge_id) > 1)
+        
+        if DebugConfig.VERBOSE_MODE:
+            print(f"🛣️ 車両生成用エッジ数: {len(valid_edges)}")
+        
+        return valid_edges
+    
+    def record_vehicle_type(self, vehicle_id, vehicle_type):
+        """車両タイプを記録（タイプ別集計はサブスクリプション結果で行うため、AV車のみ信号予測対象の集合に追加）"""
+        if vehicle_type == VehicleConfig.AUTONOMOUS_CAR_TYPE:
+            self.av_vehicle_ids.add(vehicle_id)
+    
+    def remove_arrived_vehicles(self, vehicle_ids):
+        """到着した車両をAV車両集合・予測追跡状態から除外"""
+        for vid in vehicle_ids:
+            self.av_vehicle_ids.discard(vid)
+            self.av_vehicles_tracked.pop(vid, None)
+    
+    def update_vehicle_presence(self, departed_ids, arrived_ids):
+        """
+        出発・到着した車両のリストから走行中の車両集合を差分更新し、
+        今ステップの車両データをサブスクリプション結果から一括取得
+        """
+        self.subscribe_vehicles(departed_ids)
+        self.current_vehicles.update(departed_ids)
+        self.current_vehicles.difference_update(arrived_ids)
+        self.remove_arrived_vehicles(arrived_ids)
+        self.vehicle_data = vehicle_data = traci.vehicle.getAllSubscriptionResults()
+        
+        # 出発した車両のタイプもサブスクリプション結果から登録（getTypeIDを呼ばない）
+        type_var = tc.VAR_TYPE
+        for vid in departed_ids:
+            data = vehicle_data.get(vid)
+            if data is not None:
+                self.record_vehicle_type(vid, data[type_var])
+    
+    def resync_vehicle_presence(self):
+        """
+        複数ステップをまとめて進めた後に走行中の車両集合を再同期
+        （出発・到着リストは最後のステップ分しか取れないため車両リストとの差分で補う）
+        """
+        vehicle_ids = set(traci.vehicle.getIDList())
+        self.update_vehicle_presence(vehicle_ids - self.current_vehicles,
+                                     self.current_vehicles - vehicle_ids)
+    
+    def subscribe_vehicles(self, vehicle_ids):
+        """車両変数をサブスクライブ（以降はgetAllSubscriptionResultsで一括取得）"""
+        for vid in vehicle_ids:
+            try:
+                traci.vehicle.subscribe(vid, VEHICLE_SUBSCRIPTION_VARS)
+            except traci.TraCIException:
+                if not DebugConfig.CONTINUE_ON_MINOR_ERRORS:
+                    raise
+    
+    def get_route_id(self, from_edge, to_edge):
+        """
+        出発地→目的地のルートIDを取得（経路が無い場合はNone）
+        
+        同じエッジ組合せの経路探索とルート登録は初回のみ行い、以降の車両で共有する
+        """
+        key = (from_edge, to_edge)
+        if key in self._route_cache:
+            return self._route_cache[key]
+        
+        route = traci.simulation.findRoute(from_edge, to_edge)
+        route_id = None
+        if route.edges:
+            route_id = f"route_{from_edge}_to_{to_edge}"
+            traci.route.add(route_id, route.edges)
+        
+        self._route_cache[key] = route_id
+        return route_id
+    
+    def build_route_pool(self, pool_size):
+        """ランダムな出発地・目的地の組合せで経路を探索し、使い回すルートを登録"""
+        edges = self.valid_vehicle_edges
+        if len(edges) < 2:
+            return
+        
+        for _ in range(pool_size * 10):
+            if len(self.route_pool) >= pool_size:
+                break
+            from_edge, to_edge = random.sample(edges, 2)
+            try:
+                route_id = self.get_route_id(from_edge, to_edge)
+            except traci.TraCIException:
+                continue
+            if route_id and route_id not in self.route_pool:
+                self.route_pool.append(route_id)
+        
+        if DebugConfig.VERBOSE_MODE:
+            print(f"🛣️ ルートプール登録: {len(self.route_pool)}/{pool_size} 本")
     
     def add_vehicle(self, veh_id, is_av):
         """新しい車両を追加"""
-        if not self.valid_vehicle_edges:
+        # 出発地と異なる目的地を選べない場合は追加不可
+        if len(self.valid_vehicle_edges) < 2:
             return False
             
         max_attempts = 10
@@ -582,13 +866,18 @@ class IntegratedMonitor:
         
         for attempt in range(max_attempts):
             try:
-                from_edge = random.choice(self.valid_vehicle_edges)
-                to_edge = random.choice([e for e in self.valid_vehicle_edges if e != from_edge])
-                
-                route = traci.simulation.findRoute(from_edge, to_edge)
-                if route.edges:
-                    route_id = f"route_{veh_id}"
-                    traci.route.add(route_id, route.edges)
+                if self.route_pool:
+                    # 登録済みルートから選ぶ（経路探索なしでvehicle.addのみ）
+                    route_id = random.choice(self.route_pool)
+                else:
+                    from_edge = random.choice(self.valid_vehicle_edges)
+                    # 出発地と重なった場合のみ引き直す（候補リストは毎回作らない）
+                    to_edge = random.choice(self.valid_vehicle_edges)
+                    while to_edge == from_edge:
+                        to_edge = random.choice(self.valid_vehicle_edges)
+                    
+                    route_id = self.get_route_id(from_edge, to_edge)
+                if route_id:
                     traci.vehicle.add(
                         vehID=veh_id,
                         routeID=route_id,
@@ -597,7 +886,7 @@ class IntegratedMonitor:
                     )
                     
                     # 車両タイプを記録
-                    self.vehicle_types[veh_id] = veh_type
+                    self.record_vehicle_type(veh_id, veh_type)
                     
                     if DebugConfig.VERBOSE_MODE and attempt <= 2:  # 最初の3回のみ表示
                         print(f"🚗 車両追加: {veh_id} ({veh_type})")
@@ -625,8 +914,7 @@ class IntegratedMonitor:
         
         self.last_vehicle_control_time = current_time
         
-        current_vehicles = list(traci.vehicle.getIDList())
-        current_count = len(current_vehicles)
+        current_count = len(self.current_vehicles)
         
         # 車両不足時に補充
         if current_count < self.target_vehicle_count:
@@ -649,280 +937,250 @@ class IntegratedMonitor:
         if not AV_SIGNAL_ENABLED or not self.signal_predictor:
             return
             
-        current_vehicles = set(traci.vehicle.getIDList())
+        # 走行中のAV車がいなければ何もしない
+        if not self.av_vehicle_ids:
+            return
         
-        for vehicle_id in current_vehicles:
-            # AV車のみを対象
-            if vehicle_id in self.vehicle_types and \
-               self.vehicle_types[vehicle_id] == VehicleConfig.AUTONOMOUS_CAR_TYPE:
+        # 走行中の全車両はサブスクライブ済みのため、今ステップの結果から各AV車の状態を引く
+        vehicle_data = self.vehicle_data
+        
+        # 出発待ちの車両を除き、走行中のAV車のみを対象
+        for vehicle_id in self.av_vehicle_ids & self.current_vehicles:
+            data = vehicle_data.get(vehicle_id)
+            if data is None:
+                continue  # サブスクライブに失敗した車両
+            
+            try:
+                # 現在の道路IDを取得
+                current_edge = data[tc.VAR_ROAD_ID]
+                
+                # 対象道路なら数値の道路IDを取得（対象外・数値でない道路はNone）
+                edge_num = self._edge_to_int.get(current_edge)
                 
-                try:
-                    # 現在の道路IDを取得
-                    current_edge = traci.vehicle.getRoadID(vehicle_id)
+                # まだ予測していない車両-道路の組合せ
+                if edge_num is not None and \
+                   current_edge not in self.av_vehicles_tracked.get(vehicle_id, ()):
+                    # 信号予測と速度制御を実行（S, R, L, G, V, current_speed を取得）
+                    S, R, L, G, V, current_speed = self.signal_predictor.get_signal_timing_with_speed_control(
+                        vehicle_id, edge_num, self.target_av_penetration,
+                        current_lane=data[tc.VAR_LANE_ID],
+                        current_speed_ms=data[tc.VAR_SPEED]
+                    )
                     
-                    # 対象道路かチェック
-                    if current_edge in self.target_road_edges:
-                        # まだ予測していない車両
-                        tracking_key = f"{vehicle_id}_{current_edge}"
-                        
-                        if tracking_key not in self.av_vehicles_tracked:
-                            # 道路IDを数値に変換
-                            try:
-                                edge_num = int(current_edge)
-                                
-                                # 信号予測と速度制御を実行（S, R, L, G, V, current_speed を取得）
-                                S, R, L, G, V, current_speed = self.signal_predictor.get_signal_timing_with_speed_control(
-                                    vehicle_id, edge_num, self.target_av_penetration
-                                )
-                                
-                                # 対応する信号機IDを取得
-                                signal_id = self.signal_predictor.get_signal_id_for_road(edge_num)
-                                
-                                # ログに記録
-                                prediction_record = {
-                                    'time': current_time,
-                                    'vehicle_id': vehicle_id,
-                                    'current_edge': current_edge,
-                                    'signal_id': signal_id if signal_id else 'unknown',
-                                    'time_to_green': S,
-                                    'time_to_red': R,
-                                    'lane_length': L,
-                                    'green_duration': G,
-                                    'optimal_speed': V,
-                                    'previous_speed': current_speed,
-                                    'speed_change': V - current_speed,
-                                    'current_speed_ms': traci.vehicle.getSpeed(vehicle_id)
-                                }
-                                
-                                self.av_signal_predictions.append(prediction_record)
-                                self.av_vehicles_tracked.add(tracking_key)
-                                
-                                # リアルタイム表示
-                                if hasattr(AVSignalConfig, 'SHOW_REAL_TIME_PREDICTIONS') and \
-                                   AVSignalConfig.SHOW_REAL_TIME_PREDICTIONS:
-                                    direction = "正方向" if edge_num > 0 else "逆方向"
-                                    signal_display = signal_id if signal_id else 'unknown'
-                                    speed_change_display = f"({current_speed:.1f}→{V:.1f}km/h)" if V != current_speed else f"({V:.1f}km/h維持)"
-                                    print(f"🚙 AV制御: {vehicle_id} 道路{current_edge}({direction}) → {speed_change_display} S:{S:.1f}s R:{R:.1f}s")
-                                
-                            except ValueError:
-                                # 数値変換失敗（対象外道路）
-                                continue
-                                
-                except traci.TraCIException:
-                    # 車両が削除された可能性
-                    continue
-        
-        # 削除された車両の追跡状態をクリア
-        vehicles_to_remove = []
-        for tracking_key in self.av_vehicles_tracked:
-            vehicle_id = tracking_key.split('_')[0]
-            if vehicle_id not in current_vehicles:
-                vehicles_to_remove.append(tracking_key)
-        
-        for tracking_key in vehicles_to_remove:
-            self.av_vehicles_tracked.remove(tracking_key)
+                    # 対応する信号機IDを取得
+                    signal_id = self.signal_predictor.get_signal_id_for_road(edge_num)
+                    
+                    # ログに記録
+                    self.av_signal_predictions.append(
+                        time=current_time,
+                        vehicle_id=vehicle_id,
+                        current_edge=current_edge,
+                        signal_id=signal_id if signal_id else 'unknown',
+                        time_to_green=S,
+                        time_to_red=R,
+                        lane_length=L,
+                        green_duration=G,
+                        optimal_speed=V,
+                        previous_speed=current_speed,
+                        speed_change=V - current_speed,
+                        current_speed_ms=data[tc.VAR_SPEED]
+                    )
+                    self.av_vehicles_tracked.setdefault(vehicle_id, set()).add(current_edge)
+                    
+                    # リアルタイム表示
+                    if self._show_rt:
+                        direction = "正方向" if edge_num > 0 else "逆方向"
+                        speed_change_display = f"({current_speed:.1f}→{V:.1f}km/h)" if V != current_speed else f"({V:.1f}km/h維持)"
+                        print(f"🚙 AV制御: {vehicle_id} 道路{current_edge}({direction}) → {speed_change_display} S:{S:.1f}s R:{R:.1f}s")
+                    
+            except traci.TraCIException:
+                # 車両が削除された可能性
+                continue
     
     def initialize_monitoring(self):
         """監視初期化"""
         if DebugConfig.VERBOSE_MODE:
             print("🔍 監視システム初期化中...")
         
-        # 停止監視エッジの存在確認
-        all_edges = traci.edge.getIDList()
-        for edge_id in self.target_edges:
-            if edge_id in all_edges:
-                self.valid_stop_edges.append(edge_id)
+        # 停止監視エッジの存在確認（エッジIDは intern して以降の照合表で共有）
+        # エッジ一覧の取得は初期化全体で1回だけ（順序は車両生成用に保持）
+        edge_ids = [sys.intern(edge) for edge in traci.edge.getIDList()]
+        all_edges = set(edge_ids)
+        self.valid_stop_edges = frozenset(edge for edge in all_edges if edge in self.target_edges)
         
         print(f"✅ 停止監視対象エッジ: {len(self.valid_stop_edges)}/{len(self.target_edges)} 個")
         
         # AV信号監視対象エッジの確認
         if AV_SIGNAL_ENABLED and self.target_road_edges:
-            valid_signal_edges = [edge for edge in self.target_road_edges if edge in all_edges]
+            valid_signal_edges = self.target_road_edges & all_edges
             print(f"✅ AV信号監視対象道路: {len(valid_signal_edges)}/{len(self.target_road_edges)} 個")
+            
+            # 毎ステップのint変換を避けるため数値の道路IDを事前計算
+            self._edge_to_int = {edge: int(edge) for edge in self.target_road_edges
+                                 if edge.lstrip('-').isdigit()}
+            
+            # 対象道路の信号方向インデックスを事前解決（以降の予測ではキャッシュ参照のみ）
+            if self.signal_predictor:
+                for edge_num in self._edge_to_int.values():
+                    signal_id = _ROAD_TO_SIGNAL.get(edge_num)
+                    if signal_id:
+                        self.signal_predictor.get_signal_direction_index(signal_id, edge_num)
         
         if len(self.valid_stop_edges) == 0:
             print("❌ 有効な停止監視エッジが見つかりません")
             return False
         
         # 車両生成用エッジを取得
-        self.valid_vehicle_edges = self.get_valid_vehicle_edges()
+        self.valid_vehicle_edges = self.get_valid_vehicle_edges(edge_ids)
         if not self.valid_vehicle_edges:
             print("❌ 有効な車両生成エッジが見つかりません")
             return False
         
-        # 初期車両登録（CO2監視用）
-        vehicle_ids = traci.vehicle.getIDList()
-        for vid in vehicle_ids:
-            try:
-                vtype = traci.vehicle.getTypeID(vid)
-                self.vehicle_types[vid] = vtype
-            except:
-                if DebugConfig.CONTINUE_ON_MINOR_ERRORS:
-                    continue
-                else:
-                    raise
+        # 車両追加で使い回すルートを事前登録（設定時のみ）
+        route_pool_size = getattr(VehicleConfig, 'ROUTE_POOL_SIZE', 0)
+        if route_pool_size > 0 and self.target_vehicle_count > 0:
+            self.build_route_pool(route_pool_size)
+        
+        # 初期車両登録（CO2監視用）: 既に走行中の車両は出発済みとして扱う
+        self.current_vehicles = set()
+        self.update_vehicle_presence(traci.vehicle.getIDList(), ())
+        
+        # 時刻と出発・到着車両はsimulationStepの応答に含めて受け取る
+        traci.simulation.subscribe(SIMULATION_SUBSCRIPTION_VARS)
         
         if DebugConfig.VERBOSE_MODE:
-            print(f"🚗 初期車両登録完了: {len(self.vehicle_types)} 台")
+            print(f"🚗 初期車両登録完了: {len(self.current_vehicles)} 台")
         
         return True
     
-    def update_co2_monitoring(self, current_time):
-        """CO2排出量監視更新"""
-        current_vehicles = set(traci.vehicle.getIDList())
-        
-        # 新しい車両を登録
-        for vid in current_vehicles:
-            if vid not in self.vehicle_types:
-                try:
-                    vtype = traci.vehicle.getTypeID(vid)
-                    self.vehicle_types[vid] = vtype
-                except:
-                    if DebugConfig.CONTINUE_ON_MINOR_ERRORS:
-                        continue
-                    else:
-                        raise
-        
-        # 各車両の排出量を取得
-        step_gasoline_co2 = 0.0
-        step_av_co2 = 0.0
-        
-        for vid in current_vehicles:
-            if vid in self.vehicle_types:
-                try:
-                    # CO2排出量取得 (mg/s)
-                    co2_emission = traci.vehicle.getCO2Emission(vid)
-                    distance = traci.vehicle.getSpeed(vid)
-                    vtype = self.vehicle_types[vid]
-                    
-                    # タイプ別に集計（mg → g 変換）
-                    co2_g = co2_emission / CO2MonitoringConfig.MG_TO_G_CONVERSION
-                    self.co2_emissions[vtype] += co2_g
-                    self.vehicle_distances[vtype] += distance
-                    
-                    # 車両分類別集計
-                    if vtype == VehicleConfig.GASOLINE_CAR_TYPE:
-                        step_gasoline_co2 += co2_g
-                    elif vtype == VehicleConfig.AUTONOMOUS_CAR_TYPE:
-                        step_av_co2 += co2_g
-                        
-                except:
-                    if DebugConfig.CONTINUE_ON_MINOR_ERRORS:
-                        continue
-                    else:
-                        raise
+    def update_co2_monitoring(self, current_time, steps=1):
+        """CO2排出量監視更新（stepsステップ分を今の値で代表させて加算）"""
+        # 各車両の排出量をこのステップ分だけ車両分類別に集計（mgのままローカル変数に合計）
+        gasoline_co2_mg = 0.0
+        av_co2_mg = 0.0
+        step_vehicle_counts = defaultdict(int)
+        # ループ内で参照する属性・定数はローカル変数に束縛
+        co2_var = tc.VAR_CO2EMISSION
+        type_var = tc.VAR_TYPE
+        gasoline_type = VehicleConfig.GASOLINE_CAR_TYPE
+        av_type = VehicleConfig.AUTONOMOUS_CAR_TYPE
+        
+        # サブスクリプション結果は走行中の車両1台につき1件なので、
+        # 車両タイプもIDで引き直さず結果から直接分類する
+        for data in self.vehicle_data.values():
+            vtype = data[type_var]
+            step_vehicle_counts[vtype] += 1
+            
+            # CO2排出量 (mg/s) をサブスクリプション結果から取得
+            if vtype == gasoline_type:
+                gasoline_co2_mg += data[co2_var]
+            elif vtype == av_type:
+                av_co2_mg += data[co2_var]
+        
+        # mg → g 変換は分類ごとに1回だけ行う
+        mg_to_g = steps * CO2MonitoringConfig.MG_TO_G_FACTOR
+        step_gasoline_co2 = gasoline_co2_mg * mg_to_g
+        step_av_co2 = av_co2_mg * mg_to_g
         
         # 累積排出量更新
         self.gasoline_co2 += step_gasoline_co2
         self.av_co2 += step_av_co2
         self.total_co2 = self.gasoline_co2 + self.av_co2
         
-        # ログに記録
-        gasoline_count = len([v for v, t in self.vehicle_types.items() 
-                            if t == VehicleConfig.GASOLINE_CAR_TYPE and v in current_vehicles])
-        av_count = len([v for v, t in self.vehicle_types.items() 
-                       if t == VehicleConfig.AUTONOMOUS_CAR_TYPE and v in current_vehicles])
-        
-        self.emission_log.append({
-            'time': current_time,
-            'gasoline_co2': step_gasoline_co2,
-            'av_co2': step_av_co2,
-            'total_gasoline': self.gasoline_co2,
-            'total_av': self.av_co2,
-            'gasoline_vehicles': gasoline_count,
-            'av_vehicles': av_count
-        })
+        # ログに記録（台数は現在の車両だけから数え、過去の全登録車両は走査しない）
+        self.vehicle_counts_by_type = step_vehicle_counts
+        gasoline_count = step_vehicle_counts.get(VehicleConfig.GASOLINE_CAR_TYPE, 0)
+        av_count = step_vehicle_counts.get(VehicleConfig.AUTONOMOUS_CAR_TYPE, 0)
+        
+        self.emission_log.writerow((
+            current_time, step_gasoline_co2, step_av_co2,
+            self.gasoline_co2, self.av_co2, gasoline_count, av_count
+        ))
     
     def update_stop_monitoring(self, current_time):
         """停止回数監視更新"""
-        current_vehicles = set(traci.vehicle.getIDList())
+        current_vehicles = self.current_vehicles
         
         # 統計更新
         self.total_vehicles_seen.update(current_vehicles)
         self.max_simultaneous_vehicles = max(self.max_simultaneous_vehicles, len(current_vehicles))
         
-        # 削除された車両の状態をクリア
-        vehicles_to_remove = []
-        for vehicle_id in self.vehicle_stop_states:
-            if vehicle_id not in current_vehicles:
-                vehicles_to_remove.append(vehicle_id)
-        
-        for vehicle_id in vehicles_to_remove:
+        # 削除された車両の状態をクリア（集合差で一括抽出）
+        for vehicle_id in self.vehicle_stop_states.keys() - current_vehicles:
             del self.vehicle_stop_states[vehicle_id]
         
         # 現在の車両をチェック
         new_stops_this_check = 0
         
+        # ループ内で参照する属性・定数はローカル変数に束縛
+        vehicle_data = self.vehicle_data
+        stop_states = self.vehicle_stop_states
+        valid_stop_edges = self.valid_stop_edges
+        stop_threshold = self.stop_threshold
+        min_stop_duration = self.min_stop_duration
+        speed_var = tc.VAR_SPEED
+        road_var = tc.VAR_ROAD_ID
+        
         for vehicle_id in current_vehicles:
-            try:
-                speed = traci.vehicle.getSpeed(vehicle_id)
-                edge_id = traci.vehicle.getRoadID(vehicle_id)
+            data = vehicle_data.get(vehicle_id)
+            if data is None:
+                continue  # サブスクライブに失敗した車両
+            
+            speed = data[speed_var]
+            edge_id = data[road_var]
+            
+            # 対象エッジにいるかチェック
+            if edge_id in valid_stop_edges:
                 
-                # 対象エッジにいるかチェック
-                if edge_id in self.valid_stop_edges:
-                    
-                    if speed <= self.stop_threshold:
-                        # 停止している
-                        if vehicle_id not in self.vehicle_stop_states:
-                            # 新しい停止開始
-                            self.vehicle_stop_states[vehicle_id] = {
-                                'start_time': current_time,
-                                'edge': edge_id,
-                                'counted': False
-                            }
-                        else:
-                            # 継続停止 - カウント済みかチェック
-                            stop_info = self.vehicle_stop_states[vehicle_id]
-                            stop_duration = current_time - stop_info['start_time']
-                            
-                            if not stop_info['counted'] and stop_duration >= self.min_stop_duration:
-                                # 停止をカウント
-                                self.stop_counts[edge_id] += 1
-                                stop_info['counted'] = True
-                                new_stops_this_check += 1
-                                
-                                # 詳細ログに記録
-                                self.stop_events.append({
-                                    'time': current_time,
-                                    'vehicle_id': vehicle_id,
-                                    'edge_id': edge_id,
-                                    'duration': stop_duration,
-                                    'total_count': sum(self.stop_counts.values())
-                                })
-                                
-                                # リアルタイム表示（設定に基づく）
-                                if new_stops_this_check <= StopMonitoringConfig.MAX_STOP_EVENTS_TO_PRINT:
-                                    total_stops = sum(self.stop_counts.values())
-                                    print(f"🛑 停止: 車両{vehicle_id} エッジ{edge_id} ({stop_duration:.1f}s) 総計:{total_stops}")
+                if speed <= stop_threshold:
+                    # 停止している
+                    if vehicle_id not in stop_states:
+                        # 新しい停止開始
+                        stop_states[vehicle_id] = StopState(current_time, edge_id)
                     else:
-                        # 動いている
-                        if vehicle_id in self.vehicle_stop_states:
-                            del self.vehicle_stop_states[vehicle_id]
-                else:
-                    # 対象エッジ外
-                    if vehicle_id in self.vehicle_stop_states:
-                        del self.vehicle_stop_states[vehicle_id]
+                        # 継続停止 - カウント済みかチェック
+                        stop_info = stop_states[vehicle_id]
+                        stop_duration = current_time - stop_info.start_time
                         
-            except traci.TraCIException:
-                if vehicle_id in self.vehicle_stop_states:
-                    del self.vehicle_stop_states[vehicle_id]
-                if not DebugConfig.CONTINUE_ON_MINOR_ERRORS:
-                    raise
+                        if not stop_info.counted and stop_duration >= min_stop_duration:
+                            # 停止をカウント
+                            self.stop_counts[edge_id] += 1
+                            self.total_stops += 1
+                            stop_info.counted = True
+                            new_stops_this_check += 1
+                            
+                            # 詳細ログに記録
+                            self.stop_events.writerow((
+                                current_time, vehicle_id, edge_id,
+                                stop_duration, self.total_stops
+                            ))
+                            
+                            # リアルタイム表示（設定に基づく）
+                            if new_stops_this_check <= StopMonitoringConfig.MAX_STOP_EVENTS_TO_PRINT:
+                                print(f"🛑 停止: 車両{vehicle_id} エッジ{edge_id} ({stop_duration:.1f}s) 総計:{self.total_stops}")
+                else:
+                    # 動いている
+                    if vehicle_id in stop_states:
+                        del stop_states[vehicle_id]
+            else:
+                # 対象エッジ外
+                if vehicle_id in stop_states:
+                    del stop_states[vehicle_id]
         
         return new_stops_this_check
     
     def print_status(self, current_time):
         """現在の状況を表示"""
-        current_vehicles = traci.vehicle.getIDList()
+        if not self._status_enabled:
+            return  # 状況表示が無効なら行の組み立て自体を省略
+        
+        current_vehicles = self.current_vehicles
         
-        # 車両数カウント
-        gasoline_count = len([v for v, t in self.vehicle_types.items() 
-                            if t == VehicleConfig.GASOLINE_CAR_TYPE and v in current_vehicles])
-        av_count = len([v for v, t in self.vehicle_types.items() 
-                       if t == VehicleConfig.AUTONOMOUS_CAR_TYPE and v in current_vehicles])
+        # 車両数カウント（CO2監視で数えた今ステップのタイプ別台数を使用）
+        gasoline_count = self.vehicle_counts_by_type.get(VehicleConfig.GASOLINE_CAR_TYPE, 0)
+        av_count = self.vehicle_counts_by_type.get(VehicleConfig.AUTONOMOUS_CAR_TYPE, 0)
         
-        total_stops = sum(self.stop_counts.values())
+        total_stops = self.total_stops
         total_vehicles = len(current_vehicles)
         
         # 制御状況表示
@@ -936,15 +1194,25 @@ class IntegratedMonitor:
             av_predictions_count = len(self.av_signal_predictions)
             av_prediction_status = f" | 🤖 AV予測: {av_predictions_count:3d}回"
         
-        print(f"\r⏰ 時刻: {current_time:6.0f}s | "
-              f"🚗 車両: {total_vehicles:3d}{control_status} | "
-              f"🔴 ガソリン車: {gasoline_count:3d} | "
-              f"🟢 AV車: {av_count:3d} | "
-              f"💨 CO2: {self.gasoline_co2:8.{OutputConfig.CO2_DECIMAL_PLACES}f}g | "
-              f"🛑 停止: {total_stops:4d}回{av_prediction_status}", end="")
+        self._status_buf.append(
+            f"\r⏰ 時刻: {current_time:6.0f}s | "
+            f"🚗 車両: {total_vehicles:3d}{control_status} | "
+            f"🔴 ガソリン車: {gasoline_count:3d} | "
+            f"🟢 AV車: {av_count:3d} | "
+            f"💨 CO2: {self.gasoline_co2:8.{OutputConfig.CO2_DECIMAL_PLACES}f}g | "
+            f"🛑 停止: {total_stops:4d}回{av_prediction_status}")
+        if len(self._status_buf) >= self._status_buffer_lines:
+            self.flush_status()
+    
+    def flush_status(self):
+        """溜めた状況表示を1回の書き込みで端末へ出力"""
+        if self._status_buf:
+            sys.stdout.write(''.join(self._status_buf))
+            self._status_buf.clear()
     
     def save_results(self):
         """結果保存"""
+        self.flush_status()
         if DebugConfig.VERBOSE_MODE:
             print("\n\n🔄 結果保存中...")
         
@@ -971,29 +1239,44 @@ class IntegratedMonitor:
         if DebugConfig.VERBOSE_MODE:
             print("✅ 結果保存完了")
     
+    def _av_signal_averages(self):
+        """AV信号予測の項目別平均（3つのレポートで共通に使用）"""
+        if self._av_averages is None:
+            predictions = self.av_signal_predictions
+            self._av_averages = {field: predictions.mean(field)
+                                 for field in AVPredictionLog.STAT_FIELDS}
+        return self._av_averages
+    
+    def close_logs(self):
+        """実行中に書き出しているCSVログをすべて閉じる（異常終了時も内容を確定させる）"""
+        for stream in (self.emission_log, self.stop_events, self.av_signal_predictions.stream):
+            try:
+                stream.close()
+            except OSError as e:
+                print(f"⚠️ CSVログクローズエラー ({stream.path}): {e}")
+    
     def save_co2_csv(self):
-        """CO2データをCSVで保存"""
-        csv_path = os.path.join(self.log_dir, PathConfig.CO2_EMISSION_LOG_CSV)
+        """CO2データのCSVを確定（各行は実行中に書き出し済み）"""
+        stream = self.emission_log
         try:
-            with open(csv_path, 'w', newline=OutputConfig.CSV_NEWLINE, 
-                     encoding=OutputConfig.CSV_ENCODING) as f:
-                writer = csv.DictWriter(f, fieldnames=[
-                    'time', 'gasoline_co2', 'av_co2', 'total_gasoline', 
-                    'total_av', 'gasoline_vehicles', 'av_vehicles'
-                ])
-                writer.writeheader()
-                writer.writerows(self.emission_log)
-            print(f"📊 CO2時系列データを{csv_path}に保存")
+            # 記録が無い場合もヘッダーのみのファイルを作成
+            if not stream.failed:
+                stream.open()
+            stream.close()
+            if stream.failed:
+                print(f"⚠️ CO2時系列データは書き込みエラーのため途中までです: {stream.path}")
+            else:
+                print(f"📊 CO2時系列データを{stream.path}に保存")
         except Exception as e:
             print(f"⚠️ CO2 CSV保存エラー: {e}")
     
     def save_co2_report(self):
         """CO2レポート保存"""
-        # AV普及率計算
-        if self.emission_log:
-            latest_log = self.emission_log[-1]
-            total_vehicles = latest_log['gasoline_vehicles'] + latest_log['av_vehicles']
-            av_penetration_rate = latest_log['av_vehicles'] / total_vehicles if total_vehicles > 0 else 0.0
+        # AV普及率計算（最終ステップの台数）
+        if self.emission_log.row_count:
+            latest_av_count = self.vehicle_counts_by_type.get(VehicleConfig.AUTONOMOUS_CAR_TYPE, 0)
+            total_vehicles = self.vehicle_counts_by_type.get(VehicleConfig.GASOLINE_CAR_TYPE, 0) + latest_av_count
+            av_penetration_rate = latest_av_count / total_vehicles if total_vehicles > 0 else 0.0
         else:
             av_penetration_rate = 0.0
             total_vehicles = 0
@@ -1011,19 +1294,16 @@ class IntegratedMonitor:
         # AV信号予測統計（新機能）
         av_signal_info = ""
         if AV_SIGNAL_ENABLED and self.av_signal_predictions:
-            avg_time_to_green = sum(p['time_to_green'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_time_to_red = sum(p['time_to_red'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_lane_length = sum(p['lane_length'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_green_duration = sum(p['green_duration'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
+            avg = self._av_signal_averages()
             av_signal_info = f"""
 🤖 AV信号予測統計:
    総予測回数: {len(self.av_signal_predictions)}
    監視対象道路: {len(self.target_road_edges)}個
-   平均S(青まで): {avg_time_to_green:.1f}秒
-   平均R(赤まで): {avg_time_to_red:.1f}秒
-   平均L(レーン長): {avg_lane_length:.1f}メートル
-   平均G(青時間): {avg_green_duration:.1f}秒
-   追跡済み車両-道路組合せ: {len(self.av_vehicles_tracked)}
+   平均S(青まで): {avg['time_to_green']:.1f}秒
+   平均R(赤まで): {avg['time_to_red']:.1f}秒
+   平均L(レーン長): {avg['lane_length']:.1f}メートル
+   平均G(青時間): {avg['green_duration']:.1f}秒
+   追跡済み車両-道路組合せ: {sum(len(edges) for edges in self.av_vehicles_tracked.values())}
 """
         
         report = f"""
@@ -1058,8 +1338,8 @@ CO2排出量測定結果レポート（統合監視・動的制御対応版）
     def save_stop_results(self):
         """停止回数結果保存"""
         execution_time = time.time() - self.start_time
-        total_stops = sum(self.stop_counts.values())
-        edges_with_stops = len([e for e, c in self.stop_counts.items() if c > 0])
+        total_stops = self.total_stops
+        edges_with_stops = sum(1 for c in self.stop_counts.values() if c > 0)
         
         # 制御統計
         control_info = ""
@@ -1075,18 +1355,15 @@ CO2排出量測定結果レポート（統合監視・動的制御対応版）
         # AV信号予測統計（新機能）
         av_signal_info = ""
         if AV_SIGNAL_ENABLED and self.av_signal_predictions:
-            avg_time_to_green = sum(p['time_to_green'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_time_to_red = sum(p['time_to_red'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_lane_length = sum(p['lane_length'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
-            avg_green_duration = sum(p['green_duration'] for p in self.av_signal_predictions) / len(self.av_signal_predictions)
+            avg = self._av_signal_averages()
             av_signal_info = f"""
 AV信号予測統計:
 - 総予測回数: {len(self.av_signal_predictions)}
 - 監視対象道路: {len(self.target_road_edges)}個
-- 平均S(青まで): {avg_time_to_green:.1f}秒
-- 平均R(赤まで): {avg_time_to_red:.1f}秒
-- 平均L(レーン長): {avg_lane_length:.1f}メートル
-- 平均G(青時間): {avg_green_duration:.1f}秒
+- 平均S(青まで): {avg['time_to_green']:.1f}秒
+- 平均R(赤まで): {avg['time_to_red']:.1f}秒
+- 平均L(レーン長): {avg['lane_length']:.1f}メートル
+- 平均G(青時間): {avg['green_duration']:.1f}秒
 
 """
         
@@ -1109,10 +1386,11 @@ AV信号予測統計:
 """
         
         if total_stops > 0:
-            sorted_edges = sorted(self.stop_counts.items(), key=lambda x: x[1], reverse=True)
+            # 停止のあったエッジだけを並べ替える
+            sorted_edges = [(e, c) for e, c in self.stop_counts.items() if c > 0]
+            sorted_edges.sort(key=lambda x: x[1], reverse=True)
             for edge_id, count in sorted_edges:
-                if count > 0:
-                    result_content += f"{edge_id}: {count} 回\n"
+                result_content += f"{edge_id}: {count} 回\n"
         else:
             result_content += "停止は検出されませんでした\n"
         
@@ -1126,18 +1404,14 @@ AV信号予測統計:
             print(f"⚠️ 停止結果保存エラー: {e}")
     
     def save_stop_csv(self):
-        """停止イベントをCSVで保存"""
-        if self.stop_events:
+        """停止イベントのCSVを確定（各行は実行中に書き出し済み）"""
+        if self.stop_events.row_count:
             try:
-                csv_path = os.path.join(self.log_dir, PathConfig.STOP_COUNT_DETAILED_CSV)
-                with open(csv_path, 'w', newline=OutputConfig.CSV_NEWLINE, 
-                         encoding=OutputConfig.CSV_ENCODING) as f:
-                    writer = csv.DictWriter(f, fieldnames=[
-                        'time', 'vehicle_id', 'edge_id', 'duration', 'total_count'
-                    ])
-                    writer.writeheader()
-                    writer.writerows(self.stop_events)
-                print(f"📊 停止詳細データを{csv_path}に保存")
+                self.stop_events.close()
+                if self.stop_events.failed:
+                    print(f"⚠️ 停止詳細データは書き込みエラーのため途中までです: {self.stop_events.path}")
+                else:
+                    print(f"📊 停止詳細データを{self.stop_events.path}に保存")
             except Exception as e:
                 print(f"⚠️ 停止CSV保存エラー: {e}")
     
@@ -1146,34 +1420,20 @@ AV信号予測統計:
         if not self.av_signal_predictions:
             return
         
-        # 統計計算
-        total_predictions = len(self.av_signal_predictions)
-        avg_time_to_green = sum(p['time_to_green'] for p in self.av_signal_predictions) / total_predictions
-        avg_time_to_red = sum(p['time_to_red'] for p in self.av_signal_predictions) / total_predictions
-        avg_lane_length = sum(p['lane_length'] for p in self.av_signal_predictions) / total_predictions
-        avg_green_duration = sum(p['green_duration'] for p in self.av_signal_predictions) / total_predictions
-        avg_optimal_speed = sum(p['optimal_speed'] for p in self.av_signal_predictions) / total_predictions
-        avg_speed_change = sum(abs(p['speed_change']) for p in self.av_signal_predictions) / total_predictions
-        
-        max_time_to_green = max(p['time_to_green'] for p in self.av_signal_predictions)
-        min_time_to_green = min(p['time_to_green'] for p in self.av_signal_predictions)
-        max_time_to_red = max(p['time_to_red'] for p in self.av_signal_predictions)
-        min_time_to_red = min(p['time_to_red'] for p in self.av_signal_predictions)
-        max_lane_length = max(p['lane_length'] for p in self.av_signal_predictions)
-        min_lane_length = min(p['lane_length'] for p in self.av_signal_predictions)
+        # 統計計算（予測追加時に逐次集計済み）
+        predictions = self.av_signal_predictions
+        total_predictions = len(predictions)
+        avg = self._av_signal_averages()
+        
+        max_time_to_green = predictions.maxs['time_to_green']
+        min_time_to_green = predictions.mins['time_to_green']
+        max_time_to_red = predictions.maxs['time_to_red']
+        min_time_to_red = predictions.mins['time_to_red']
+        max_lane_length = predictions.maxs['lane_length']
+        min_lane_length = predictions.mins['lane_length']
         
         # 道路別統計
-        edge_stats = defaultdict(lambda: {
-            'green_times': [], 'red_times': [], 'lane_lengths': [], 
-            'green_durations': [], 'optimal_speeds': [], 'speed_changes': []
-        })
-        for pred in self.av_signal_predictions:
-            edge_stats[pred['current_edge']]['green_times'].append(pred['time_to_green'])
-            edge_stats[pred['current_edge']]['red_times'].append(pred['time_to_red'])
-            edge_stats[pred['current_edge']]['lane_lengths'].append(pred['lane_length'])
-            edge_stats[pred['current_edge']]['green_durations'].append(pred['green_duration'])
-            edge_stats[pred['current_edge']]['optimal_speeds'].append(pred['optimal_speed'])
-            edge_stats[pred['current_edge']]['speed_changes'].append(abs(pred['speed_change']))
+        edge_stats = predictions.edge_stats
         
         result_content = f"""AV信号予測・速度制御結果（統合監視システム）
 
@@ -1182,12 +1442,12 @@ AV信号予測統計:
 
 AV信号予測・速度制御統計:
 - 総制御回数: {total_predictions} 回
-- 平均青信号待ち時間(S): {avg_time_to_green:.1f} 秒
-- 平均赤信号待ち時間(R): {avg_time_to_red:.1f} 秒
-- 平均レーン長(L): {avg_lane_length:.1f} メートル
-- 平均青信号時間(G): {avg_green_duration:.1f} 秒
-- 平均最適速度(V): {avg_optimal_speed:.1f} km/h
-- 平均速度変化: {avg_speed_change:.1f} km/h
+- 平均青信号待ち時間(S): {avg['time_to_green']:.1f} 秒
+- 平均赤信号待ち時間(R): {avg['time_to_red']:.1f} 秒
+- 平均レーン長(L): {avg['lane_length']:.1f} メートル
+- 平均青信号時間(G): {avg['green_duration']:.1f} 秒
+- 平均最適速度(V): {avg['optimal_speed']:.1f} km/h
+- 平均速度変化: {avg['speed_change']:.1f} km/h
 - 最大青信号待ち時間: {max_time_to_green:.1f} 秒
 - 最小青信号待ち時間: {min_time_to_green:.1f} 秒  
 - 最大赤信号待ち時間: {max_time_to_red:.1f} 秒
@@ -1201,21 +1461,14 @@ AV信号予測・速度制御統計:
 """
         
         for edge_id in sorted(edge_stats.keys()):
-            green_times = edge_stats[edge_id]['green_times']
-            red_times = edge_stats[edge_id]['red_times']
-            lane_lengths = edge_stats[edge_id]['lane_lengths']
-            green_durations = edge_stats[edge_id]['green_durations']
-            optimal_speeds = edge_stats[edge_id]['optimal_speeds']
-            speed_changes = edge_stats[edge_id]['speed_changes']
+            edge_count = edge_stats[edge_id]['count']
+            edge_sums = edge_stats[edge_id]['sums']
             
-            avg_green = sum(green_times) / len(green_times)
-            avg_red = sum(red_times) / len(red_times)
-            avg_lane = sum(lane_lengths) / len(lane_lengths)
-            avg_g_duration = sum(green_durations) / len(green_durations)
-            avg_opt_speed = sum(optimal_speeds) / len(optimal_speeds)
-            avg_speed_change = sum(speed_changes) / len(speed_changes)
+            avg_green = edge_sums['time_to_green'] / edge_count
+            avg_opt_speed = edge_sums['optimal_speed'] / edge_count
+            avg_speed_change = edge_sums['speed_change'] / edge_count
             
-            result_content += f"道路{edge_id}: {len(green_times)}回制御, S={avg_green:.1f}s, V={avg_opt_speed:.1f}km/h, 速度変化={avg_speed_change:.1f}km/h\n"
+            result_content += f"道路{edge_id}: {edge_count}回制御, S={avg_green:.1f}s, V={avg_opt_speed:.1f}km/h, 速度変化={avg_speed_change:.1f}km/h\n"
         
         # ファイル保存
         if hasattr(PathConfig, 'AV_SIGNAL_RESULTS_TXT'):
@@ -1231,35 +1484,42 @@ AV信号予測・速度制御統計:
             print(f"⚠️ AV信号予測結果保存エラー: {e}")
     
     def save_av_signal_csv(self):
-        """AV信号予測データをCSVで保存（新機能）"""
+        """AV信号予測データのCSVを確定（各行は実行中に書き出し済み）（新機能）"""
         if self.av_signal_predictions:
             try:
-                if hasattr(PathConfig, 'AV_SIGNAL_PREDICTIONS_CSV'):
-                    csv_path = os.path.join(self.log_dir, PathConfig.AV_SIGNAL_PREDICTIONS_CSV)
+                stream = self.av_signal_predictions.stream
+                stream.close()
+                if stream.failed:
+                    print(f"⚠️ AV信号予測データは書き込みエラーのため途中までです: {stream.path}")
                 else:
-                    csv_path = os.path.join(self.log_dir, "av_signal_predictions.csv")
-                    
-                with open(csv_path, 'w', newline=OutputConfig.CSV_NEWLINE, 
-                         encoding=OutputConfig.CSV_ENCODING) as f:
-                    writer = csv.DictWriter(f, fieldnames=[
-                        'time', 'vehicle_id', 'current_edge', 'signal_id', 
-                        'time_to_green', 'time_to_red', 'lane_length', 'green_duration', 
-                        'optimal_speed', 'previous_speed', 'speed_change', 'current_speed_ms'
-                    ])
-                    writer.writeheader()
-                    writer.writerows(self.av_signal_predictions)
-                print(f"🤖 AV信号予測データを{csv_path}に保存")
+                    print(f"🤖 AV信号予測データを{stream.path}に保存")
             except Exception as e:
                 print(f"⚠️ AV信号予測CSV保存エラー: {e}")
     
     def print_integrated_summary(self):
         """統合サマリー表示（簡潔版）"""
-        total_stops = sum(self.stop_counts.values())
+        total_stops = self.total_stops
         
         print("🎯 統合監視結果:")
         print(f"   💨 総CO2排出量: {self.total_co2:.{OutputConfig.CO2_DECIMAL_PLACES}f} g")
         print(f"   🛑 総停止回数: {total_stops} 回")
 
+def select_traci_backend(use_gui):
+    """TraCIバックエンドを選択
+    
+    GUIなしの場合はインプロセスのlibsumoを優先する（APIはtraciと同一で、
+    呼び出しごとのソケット往復がない）。モジュール内の traci 参照はすべて
+    このグローバル名を経由するため、ここで差し替えれば全体に反映される。
+    """
+    global traci
+    if use_gui:
+        return
+    try:
+        import libsumo
+        traci = libsumo
+    except ImportError:
+        pass
+
 def signal_handler(sig, frame):
     """Ctrl+Cでの終了処理"""
     print("\n\n⚠️  シミュレーション中断中...")
@@ -1277,6 +1537,10 @@ def main():
                        help=f'SUMO設定ファイル (デフォルト: {PathConfig.DEFAULT_SUMO_CONFIG})')
     parser.add_argument('--gui', action='store_true', 
                        help='SUMO-GUIで実行')
+    parser.add_argument('--output-dir', default=PathConfig.LOG_DIR,
+                       help=f'ログ出力ディレクトリ (デフォルト: {PathConfig.LOG_DIR})')
+    parser.add_argument('--quiet', action='store_true',
+                       help='実行中の状況表示を省略（開始・終了時の出力と結果ファイルはそのまま）')
     
     # 動的車両制御用パラメータ
     parser.add_argument('--vehicles', type=int, default=0,
@@ -1285,10 +1549,11 @@ def main():
                        help='AV普及率%% (0-100)')
     
     args = parser.parse_args()
+    ensure_config_valid()  # 不正な設定ならSUMOを起動する前に終了
+    select_traci_backend(args.gui)
     
     # SUMOコマンド設定
-    sumo_binary = SimulationConfig.SUMO_GUI_BINARY if args.gui else SimulationConfig.SUMO_BINARY
-    sumo_cmd = [sumo_binary, "-c", args.config] + SimulationConfig.SUMO_CMD_OPTIONS
+    sumo_cmd = make_sumo_argv(args.config, args.gui)
     
     print("🔍 統合監視システム開始（動的制御対応版）...")
     feature_list = "CO2排出量測定 + 停止回数カウント + 動的車両制御"
@@ -1310,9 +1575,12 @@ def main():
     # シグナルハンドラー設定
     signal.signal(signal.SIGINT, signal_handler)
     
+    monitor = None
     try:
-        traci.start(sumo_cmd)
-        monitor = IntegratedMonitor()
+        traci.start(list(sumo_cmd))  # traci.startは引数リストに接続ポート指定を連結するためlistで渡す
+        # GUI実行中は画面と表示がずれないよう状況表示を毎回書き出す
+        monitor = IntegratedMonitor(log_dir=args.output_dir, show_status=not args.quiet,
+                                    status_buffer_lines=1 if args.gui else None)
         
         # 動的車両制御を設定
         if args.vehicles > 0:
@@ -1325,15 +1593,34 @@ def main():
         
         last_check_time = 0
         last_av_check_time = 0
-        
-        # シミュレーションループ
+        last_status_step = 0
+        step_batch = max(1, int(getattr(SimulationConfig, 'STEP_BATCH', 1)))
+        # 実際のステップ長は.sumocfgや--step-lengthで決まるため、SUMOから1回だけ取得する
+        step_length = traci.simulation.getDeltaT()
+        current_time = traci.simulation.getTime()
+        departed_var = tc.VAR_DEPARTED_VEHICLES_IDS
+        arrived_var = tc.VAR_ARRIVED_VEHICLES_IDS
+        
+        # シミュレーションループ（ループ中は循環GCを止め、終了後にまとめて回収）
+        gc.disable()
         while traci.simulation.getMinExpectedNumber() > 0:
-            traci.simulationStep()
-            monitor.step_count += 1
-            current_time = traci.simulation.getTime()
+            if step_batch > 1:
+                # 複数ステップを1回のTraCI呼び出しで進める
+                traci.simulationStep(current_time + step_batch * step_length)
+                monitor.step_count += step_batch
+                current_time = traci.simulation.getSubscriptionResults()[tc.VAR_TIME]
+                monitor.resync_vehicle_presence()
+            else:
+                traci.simulationStep()
+                monitor.step_count += 1
+                sim_data = traci.simulation.getSubscriptionResults()
+                current_time = sim_data[tc.VAR_TIME]
+                
+                # 出発・到着した車両の差分だけで走行中の車両集合を更新
+                monitor.update_vehicle_presence(sim_data[departed_var], sim_data[arrived_var])
             
             # CO2監視更新
-            monitor.update_co2_monitoring(current_time)
+            monitor.update_co2_monitoring(current_time, step_batch)
             
             # 停止監視更新
             if current_time - last_check_time >= monitor.check_interval:
@@ -1352,11 +1639,15 @@ def main():
                 monitor.update_vehicle_control(current_time, SimulationConfig.DEFAULT_END_TIME)
             
             # 定期的に表示更新
-            if monitor.step_count % CO2MonitoringConfig.REPORT_INTERVAL_STEPS == 0:
+            if monitor.step_count - last_status_step >= CO2MonitoringConfig.REPORT_INTERVAL_STEPS:
                 monitor.print_status(current_time)
+                last_status_step = monitor.step_count
 
             
         
+        gc.enable()
+        gc.collect()
+        
         print("\n\n🎉 統合監視完了!")
         monitor.save_results()
         
@@ -1366,6 +1657,10 @@ def main():
             import traceback
             traceback.print_exc()
     finally:
+        gc.enable()
+        if monitor is not None:
+            monitor.flush_status()  # 異常終了時も溜めた状況表示を捨てない
+            monitor.close_logs()
         try:
             traci.close()
         except:
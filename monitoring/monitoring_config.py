@@ -7,22 +7,31 @@
 """
 
 import os
-TARGET_EDGES = [
+import re
+import sys
+from functools import lru_cache
+# 監視対象エッジID一覧（停止監視・AV信号予測で同じオブジェクトを共有する）
+TARGET_EDGES = tuple(sys.intern(edge) for edge in (
     "1","2","3","4","5","6","7","8","9","10","11","12",
     "-1","-2","-3","-4","-5","-6","-7","-8","-9","-10","-11","-12",
-]
+))
+TARGET_EDGES_SET = frozenset(TARGET_EDGES)
 # =============================================================================
 # ファイル・ディレクトリ設定
 # =============================================================================
 
+# プロジェクトのルートディレクトリ（このファイルがある monitoring/ の1つ上）
+# 実行時のカレントディレクトリに関係なく同じ場所を指すよう、パスはここを基準に組み立てる
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class PathConfig:
     """ファイルパス設定"""
-    # ログ出力ディレクトリ（monitoring/フォルダから相対パス）
-    LOG_DIR = os.path.join("..", "data", "log")
+    # ログ出力ディレクトリ
+    LOG_DIR = os.path.join(PROJECT_DIR, "data", "log")
     
-    # SUMOファイル（monitoring/フォルダから相対パス）
-    DEFAULT_SUMO_CONFIG = os.path.join("..", "config", "mixed_traffic.sumocfg")
-    DEFAULT_NETWORK_FILE = os.path.join("..", "config", "3gousen_new.net.xml")
+    # SUMOファイル
+    DEFAULT_SUMO_CONFIG = os.path.join(PROJECT_DIR, "config", "mixed_traffic.sumocfg")
+    DEFAULT_NETWORK_FILE = os.path.join(PROJECT_DIR, "config", "3gousen_new.net.xml")
     
     # 出力ファイル名
     CO2_EMISSION_LOG_CSV = "co2_emission_log.csv"
@@ -42,11 +51,12 @@ class PathConfig:
 class VehicleConfig:
     """車両関連設定"""
     # 車両タイプ定義
-    GASOLINE_CAR_TYPE = "gasoline_car"
-    AUTONOMOUS_CAR_TYPE = "autonomous_car"
+    GASOLINE_CAR_TYPE = sys.intern("gasoline_car")
+    AUTONOMOUS_CAR_TYPE = sys.intern("autonomous_car")
     
-    # 車両タイプ一覧
-    VEHICLE_TYPES = [GASOLINE_CAR_TYPE, AUTONOMOUS_CAR_TYPE]
+    # 車両タイプ一覧（順序付きの一覧と、in 判定用の集合）
+    VEHICLE_TYPES = (GASOLINE_CAR_TYPE, AUTONOMOUS_CAR_TYPE)
+    VEHICLE_TYPES_SET = frozenset(VEHICLE_TYPES)
     
     # 車両生成設定
     DEFAULT_TOTAL_VEHICLES = 100
@@ -55,6 +65,7 @@ class VehicleConfig:
     # 動的車両制御（traffic_controller用）
     MAX_VEHICLES_PER_STEP = 5  # 一度に追加する最大車両数
     STOP_GENERATION_BEFORE_END = 60  # 終了X秒前に車両生成停止
+    ROUTE_POOL_SIZE = 0  # 0より大きいと初期化時にこの数のルートを登録し、車両追加時は経路探索せずに使い回す
 
 # =============================================================================
 # CO2監視設定
@@ -64,6 +75,7 @@ class CO2MonitoringConfig:
     """CO2排出量監視設定"""
     # 測定単位変換
     MG_TO_G_CONVERSION = 1000.0  # mg → g 変換
+    MG_TO_G_FACTOR = 1.0 / MG_TO_G_CONVERSION  # mg → g 変換係数（割り算の代わりに掛ける）
     
     # レポート設定
     REPORT_INTERVAL_STEPS = 10  # X ステップごとに状況表示
@@ -80,10 +92,9 @@ class StopMonitoringConfig:
     CHECK_INTERVAL = 1.0        # 秒 - チェック間隔
     
     # 監視対象エッジID一覧
-    TARGET_EDGES = [
-        "1","2","3","4","5","6","7","8","9","10","11","12",
-        "-1","-2","-3","-4","-5","-6","-7","-8","-9","-10","-11","-12",
-    ]
+    TARGET_EDGES = TARGET_EDGES
+    # 所属判定用（毎ステップの in 判定はこちらを使う）
+    TARGET_EDGES_SET = TARGET_EDGES_SET
     
     # 停止回数表示設定
     MAX_STOP_EVENTS_TO_PRINT = 3  # リアルタイムで表示する停止イベント数
@@ -96,11 +107,12 @@ class StopMonitoringConfig:
 class AVSignalConfig:
     """AV車信号予測機能の設定"""
     
-    # 監視対象道路ID（文字列形式）
-    TARGET_ROAD_EDGES = [
-        "1", "2", "3", "4", "5", "6", "7", "8", "9", "10", "11", "12",
-        "-1", "-2", "-3", "-4", "-5", "-6", "-7", "-8", "-9", "-10", "-11", "-12"
-    ]
+    # 監視対象道路ID（文字列形式、停止監視と同じ一覧）
+    TARGET_ROAD_EDGES = TARGET_EDGES
+    # 所属判定用（毎ステップの in 判定はこちらを使う）
+    TARGET_ROAD_EDGES_SET = TARGET_EDGES_SET
+    # レーンID（例: "3_0", "-12_1"）から道路IDを取り出すパターン（監視対象かどうかは TARGET_ROAD_EDGES_SET で判定）
+    EDGE_LANE_PATTERN = re.compile(r"^(-?\d+)(?:_\d+)?$")
     
     # 監視間隔設定
     CHECK_INTERVAL = 1.0                # AV信号予測チェック間隔 (秒)
@@ -121,6 +133,14 @@ class AVSignalConfig:
     MAX_JUNCTION_INDEX = 13             # 最大交差点番号
     MIN_JUNCTION_INDEX = 1              # 最小交差点番号
 
+def edge_of_lane(lane_id: str):
+    """レーンIDから監視対象道路IDを取得（対象外のレーンならNone）"""
+    match = AVSignalConfig.EDGE_LANE_PATTERN.match(lane_id)
+    if match is None:
+        return None
+    edge_id = match.group(1)
+    return edge_id if edge_id in AVSignalConfig.TARGET_ROAD_EDGES_SET else None
+
 # =============================================================================
 # シミュレーション制御設定
 # =============================================================================
@@ -130,16 +150,23 @@ class SimulationConfig:
     # デフォルト実行時間
     DEFAULT_END_TIME = 1000  # 秒
     DEFAULT_STEP_LENGTH = 1.0  # ステップ長（秒）
+    STEP_BATCH = 1  # 1回のsimulationStepで進めるステップ数（1より大きいと監視はその間隔でのサンプリングになる）
     
     # SUMOコマンド設定
     SUMO_BINARY = "sumo"
     SUMO_GUI_BINARY = "sumo-gui"
-    SUMO_CMD_OPTIONS = ["--start", "--no-warnings", "--time-to-teleport", "-1"]
+    SUMO_CMD_OPTIONS = ("--start", "--no-warnings", "--time-to-teleport", "-1")
     
     # 表示・ログ設定
     STATUS_DISPLAY_INTERVAL = 10  # 秒ごとに状況表示
     PROGRESS_DISPLAY_INTERVAL = 200  # ステップごとに進捗表示
 
+@lru_cache(maxsize=8)
+def make_sumo_argv(config_path: str, gui: bool = False):
+    """SUMO起動コマンドをタプルで組み立てる（同じ設定ファイルなら再利用）"""
+    binary = SimulationConfig.SUMO_GUI_BINARY if gui else SimulationConfig.SUMO_BINARY
+    return (binary, "-c", config_path, *SimulationConfig.SUMO_CMD_OPTIONS)
+
 # =============================================================================
 # レポート設定
 # =============================================================================
@@ -196,6 +223,10 @@ class OutputConfig:
     PERCENTAGE_DECIMAL_PLACES = 1  # パーセンテージの小数点以下桁数
     TIME_DECIMAL_PLACES = 1     # 時間の小数点以下桁数
     
+    # 状況表示設定
+    STATUS_BUFFER_LINES = 10    # 状況表示をN回分まとめて書き出す（--gui 実行時は毎回書き出す）
+    STATUS_TTY_ONLY = False     # True にすると標準出力が端末のときだけ状況表示（リダイレクト先への出力を省略）
+    
     # AV信号予測表示設定（新規追加）
     AV_SIGNAL_TIME_FORMAT = "{:.1f}"    # AV信号時間表示フォーマット
     AV_SIGNAL_SUMMARY_TOP_N = 10        # サマリー表示上位N件
@@ -204,59 +235,58 @@ class OutputConfig:
 # ヘルパー関数
 # =============================================================================
 
-def validate_config():
-    """設定値の妥当性をチェック"""
-    errors = []
-    
+# 設定値検証の表: (検証対象の値を読む関数, 値が正しいか判定する関数, エラーメッセージ)
+_CONFIG_CHECKS = (
     # 停止監視設定チェック
-    if StopMonitoringConfig.STOP_SPEED_THRESHOLD < 0:
-        errors.append("停止速度閾値は0以上である必要があります")
-    
-    if StopMonitoringConfig.MIN_STOP_DURATION <= 0:
-        errors.append("最小停止時間は0より大きい必要があります")
-    
+    (lambda: StopMonitoringConfig.STOP_SPEED_THRESHOLD, lambda v: v >= 0,
+     "停止速度閾値は0以上である必要があります"),
+    (lambda: StopMonitoringConfig.MIN_STOP_DURATION, lambda v: v > 0,
+     "最小停止時間は0より大きい必要があります"),
     # エッジリストチェック
-    if not StopMonitoringConfig.TARGET_EDGES:
-        errors.append("監視対象エッジが設定されていません")
-    
+    (lambda: tuple(StopMonitoringConfig.TARGET_EDGES), bool,
+     "監視対象エッジが設定されていません"),
     # 車両設定チェック
-    if not (0 <= VehicleConfig.DEFAULT_AV_PENETRATION <= 1):
-        errors.append("AV普及率は0-1の範囲である必要があります")
-    
+    (lambda: VehicleConfig.DEFAULT_AV_PENETRATION, lambda v: 0 <= v <= 1,
+     "AV普及率は0-1の範囲である必要があります"),
     # AV信号予測設定チェック（新規追加）
-    if AVSignalConfig.CHECK_INTERVAL <= 0:
-        errors.append("AV信号予測チェック間隔は0より大きい必要があります")
-    
-    if not AVSignalConfig.TARGET_ROAD_EDGES:
-        errors.append("AV信号予測対象道路が設定されていません")
-    
-    if AVSignalConfig.SIGNAL_DIRECTION_CACHE_SIZE <= 0:
-        errors.append("信号方向キャッシュサイズは0より大きい必要があります")
-    
-    if not (1 <= AVSignalConfig.MIN_JUNCTION_INDEX <= AVSignalConfig.MAX_JUNCTION_INDEX):
-        errors.append("交差点番号の範囲が不正です")
-    
-    return errors
+    (lambda: AVSignalConfig.CHECK_INTERVAL, lambda v: v > 0,
+     "AV信号予測チェック間隔は0より大きい必要があります"),
+    (lambda: tuple(AVSignalConfig.TARGET_ROAD_EDGES), bool,
+     "AV信号予測対象道路が設定されていません"),
+    (lambda: AVSignalConfig.SIGNAL_DIRECTION_CACHE_SIZE, lambda v: v > 0,
+     "信号方向キャッシュサイズは0より大きい必要があります"),
+    (lambda: (AVSignalConfig.MIN_JUNCTION_INDEX, AVSignalConfig.MAX_JUNCTION_INDEX),
+     lambda v: 1 <= v[0] <= v[1],
+     "交差点番号の範囲が不正です"),
+)
+
+def validate_config():
+    """設定値の妥当性をチェック（エラーメッセージのタプルを返す）"""
+    return tuple(message for read, is_valid, message in _CONFIG_CHECKS
+                 if not is_valid(read()))
+
+SUMMARY_SEPARATOR = "=" * 50
 
 def print_config_summary():
-    """設定サマリーを表示"""
-    print("=" * 50)
-    print("      統合監視システム設定サマリー")
-    print(f"             {ReportConfig.VERSION}")
-    print("=" * 50)
-    print(f"監視対象エッジ数: {len(StopMonitoringConfig.TARGET_EDGES)}")
-    print(f"停止判定速度: {StopMonitoringConfig.STOP_SPEED_THRESHOLD} m/s")
-    print(f"停止時間閾値: {StopMonitoringConfig.MIN_STOP_DURATION} 秒")
-    print(f"デフォルト車両数: {VehicleConfig.DEFAULT_TOTAL_VEHICLES}")
-    print(f"デフォルトAV普及率: {VehicleConfig.DEFAULT_AV_PENETRATION*100:.1f}%")
-    print(f"ログ出力先: {PathConfig.LOG_DIR}")
-    print()
-    print("🤖 AV信号予測設定:")
-    print(f"監視対象道路数: {len(AVSignalConfig.TARGET_ROAD_EDGES)}")
-    print(f"予測チェック間隔: {AVSignalConfig.CHECK_INTERVAL} 秒")
-    print(f"リアルタイム表示: {'有効' if AVSignalConfig.SHOW_REAL_TIME_PREDICTIONS else '無効'}")
-    print(f"交差点範囲: J{AVSignalConfig.MIN_JUNCTION_INDEX}〜J{AVSignalConfig.MAX_JUNCTION_INDEX}")
-    print("=" * 50)
+    """設定サマリーを表示（1回の出力にまとめて書き出す）"""
+    summary = f"""{SUMMARY_SEPARATOR}
+      統合監視システム設定サマリー
+             {ReportConfig.VERSION}
+{SUMMARY_SEPARATOR}
+監視対象エッジ数: {len(StopMonitoringConfig.TARGET_EDGES)}
+停止判定速度: {StopMonitoringConfig.STOP_SPEED_THRESHOLD} m/s
+停止時間閾値: {StopMonitoringConfig.MIN_STOP_DURATION} 秒
+デフォルト車両数: {VehicleConfig.DEFAULT_TOTAL_VEHICLES}
+デフォルトAV普及率: {VehicleConfig.DEFAULT_AV_PENETRATION*100:.1f}%
+ログ出力先: {PathConfig.LOG_DIR}
+
+🤖 AV信号予測設定:
+監視対象道路数: {len(AVSignalConfig.TARGET_ROAD_EDGES)}
+予測チェック間隔: {AVSignalConfig.CHECK_INTERVAL} 秒
+リアルタイム表示: {'有効' if AVSignalConfig.SHOW_REAL_TIME_PREDICTIONS else '無効'}
+交差点範囲: J{AVSignalConfig.MIN_JUNCTION_INDEX}〜J{AVSignalConfig.MAX_JUNCTION_INDEX}
+{SUMMARY_SEPARATOR}"""
+    print(summary)
 
 # =============================================================================
 # 設定値検証（モジュール読み込み時に実行）
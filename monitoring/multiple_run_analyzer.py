@@ -7,6 +7,7 @@
 使用方法:
     python multiple_run_analyzer.py --vehicles 100 --av-penetration 50 --runs 3
     python multiple_run_analyzer.py --vehicles 50 --av-penetration 30 --runs 5
+    python multiple_run_analyzer.py --vehicles 100 --av-penetration 50 --runs 8 --jobs 4
 """
 
 import os
@@ -17,13 +18,169 @@ import time
 import re
 import csv
 import statistics
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
+SIMULATION_TIMEOUT = 300  # 1回あたりのタイムアウト（秒）
+OUTPUT_TAIL_LINES = 50    # 失敗時に表示するサブプロセス出力の末尾行数
+
+# 結果ファイルから数値を抜き出すパターン（毎回コンパイルし直さないようモジュール読み込み時に1回だけ）
+STOP_COUNT_PATTERN = re.compile(r'総停止回数:\s*(\d+)\s*回')          # "総停止回数: XXX 回"
+GASOLINE_CO2_PATTERN = re.compile(r'ガソリン車総排出量:\s*([\d.]+)\s*g')  # "🔴 ガソリン車総排出量: XXX.XX g"
+
+# 同時実行中の各回の表示が1行の途中で混ざらないようにするロック
+_output_lock = threading.Lock()
+
+def log_line(message):
+    """他のスレッドの出力と混ざらないよう、1件のメッセージをまとめて表示"""
+    with _output_lock:
+        print(message)
+
+# 集計行はどちらのレポートも冒頭の数十行以内にある（以降はエッジ別の一覧など）
+REPORT_HEAD_BYTES = 8192
+CSV_TAIL_BYTES = 4096
+
+def read_report_head(path, nbytes=REPORT_HEAD_BYTES):
+    """レポートファイルの先頭 nbytes だけを読んで返す（ファイル全体は読まない）"""
+    with open(path, 'rb') as f:
+        return f.read(nbytes).decode('utf-8', errors='replace')
+
+def read_last_csv_row(path, nbytes=CSV_TAIL_BYTES):
+    """
+    CSVファイルの最終行だけを末尾から読み、ヘッダーをキーにした辞書で返す
+    
+    Returns:
+        dict: 最終行（データ行がなければ None）
+    """
+    with open(path, 'rb') as f:
+        header = f.readline().decode('utf-8', errors='replace')
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - nbytes))
+        lines = f.read().decode('utf-8', errors='replace').splitlines()
+    last_line = lines[-1] if lines else ''
+    if not last_line or last_line == header.rstrip('\r\n'):
+        return None
+    fieldnames = next(csv.reader([header]))
+    return next(csv.DictReader([last_line], fieldnames=fieldnames))
+
+@lru_cache(maxsize=512)
+def parse_run_dir(dir_path, verbose=False, prefix=""):
+    """
+    1回分の出力ディレクトリの結果ファイルから数値を抽出
+    
+    同じディレクトリを再度解析するときはファイルを開かずキャッシュした結果を返す
+    （各回の出力先は実行ごとに別ディレクトリなので、終了後に内容は変わらない）
+    
+    Args:
+        dir_path (str): 出力ディレクトリ（解決済みの絶対パス）
+        verbose (bool): 解析状況を表示
+        prefix (str): 表示する各行の先頭に付ける文字列（同時実行時の回の識別用）
+        
+    Returns:
+        tuple: (総停止回数, ガソリン車CO2排出量) または (None, None)
+    """
+    run_dir = Path(dir_path)
+    stop_count = None
+    co2_emission = None
+    
+    stop_file = run_dir / "stop_count_results.txt"
+    co2_file = run_dir / "co2_emission_report.txt"
+    csv_file = run_dir / "co2_emission_log.csv"
+    
+    # 存在確認（stat）はせず、開いてみて無ければ FileNotFoundError で判定する
+    missing_files = []
+    
+    # 停止回数を解析
+    try:
+        content = read_report_head(stop_file)
+        match = STOP_COUNT_PATTERN.search(content)
+        if match:
+            stop_count = int(match.group(1))
+            if verbose:
+                log_line(f"{prefix}✅ 停止回数抽出成功: {stop_count}回")
+        else:
+            log_line(f"{prefix}⚠️ 停止回数パターンが見つかりません")
+    except FileNotFoundError:
+        missing_files.append(stop_file.name)
+    except Exception as e:
+        log_line(f"{prefix}⚠️ 停止回数解析エラー: {e}")
+    
+    # CO2排出量を解析
+    try:
+        content = read_report_head(co2_file)
+        match = GASOLINE_CO2_PATTERN.search(content)
+        if match:
+            co2_emission = float(match.group(1))
+            if verbose:
+                log_line(f"{prefix}✅ CO2排出量抽出成功: {co2_emission:.1f}g")
+        else:
+            log_line(f"{prefix}⚠️ CO2排出量パターンが見つかりません")
+    except FileNotFoundError:
+        missing_files.append(co2_file.name)
+    except Exception as e:
+        log_line(f"{prefix}⚠️ CO2排出量解析エラー: {e}")
+    
+    # CSV からの代替解析（メインファイルが失敗した場合）
+    if co2_emission is None:
+        try:
+            # 最終行の累積ガソリン車CO2（全行は読み込まない）
+            last_row = read_last_csv_row(csv_file)
+            if last_row:
+                co2_emission = float(last_row['total_gasoline'])
+                if verbose:
+                    log_line(f"{prefix}✅ CSV からCO2排出量抽出: {co2_emission:.1f}g")
+        except FileNotFoundError:
+            missing_files.append(csv_file.name)
+        except Exception as e:
+            log_line(f"{prefix}⚠️ CSV CO2解析エラー: {e}")
+    
+    if missing_files and verbose:
+        log_line(f"{prefix}🔍 結果ファイルなし: {', '.join(missing_files)}")
+    
+    return stop_count, co2_emission
+
+def summarize_values(values, with_median=True):
+    """
+    数値リストの統計量をまとめて計算
+    
+    平均・標準偏差・最小・最大はWelford法でリストを1回走査するだけで求める
+    
+    Returns:
+        dict: values, mean, stdev, min, max（with_median なら median も）
+    """
+    count = 0
+    mean = 0.0
+    sq_dev_sum = 0.0  # 平均からの偏差平方和
+    minimum = maximum = values[0]
+    for value in values:
+        count += 1
+        delta = value - mean
+        mean += delta / count
+        sq_dev_sum += delta * (value - mean)
+        if value < minimum:
+            minimum = value
+        elif value > maximum:
+            maximum = value
+    
+    summary = {
+        'values': values,
+        'mean': mean,
+        'stdev': (sq_dev_sum / (count - 1)) ** 0.5 if count > 1 else 0.0,
+        'min': minimum,
+        'max': maximum
+    }
+    if with_median:
+        summary['median'] = statistics.median(values)
+    return summary
+
 class MultipleRunAnalyzer:
     """複数回実行・統計分析クラス"""
     
-    def __init__(self, vehicles, av_penetration, num_runs):
+    def __init__(self, vehicles, av_penetration, num_runs, jobs=1, quiet=False, verbose=False):
         """
         初期化
         
@@ -31,10 +188,16 @@ class MultipleRunAnalyzer:
             vehicles (int): 総車両数
             av_penetration (float): AV普及率 (%)
             num_runs (int): 実行回数
+            jobs (int): 同時実行数
+            quiet (bool): サブプロセスの出力を読まずに捨てる
+            verbose (bool): 実行コマンドや結果ファイルの解析状況も表示
         """
         self.vehicles = vehicles
         self.av_penetration = av_penetration
         self.num_runs = num_runs
+        self.jobs = max(1, min(jobs, num_runs))  # 実行回数より多いワーカーは使われないので回数までに抑える
+        self.quiet = quiet
+        self.verbose = verbose
         
         # パス設定
         self.monitoring_dir = Path(".")  # monitoring/ フォルダから実行想定
@@ -46,10 +209,17 @@ class MultipleRunAnalyzer:
         self.results = []
         self.start_time = datetime.now()
         
+        # 各回の出力先（同時実行しても結果ファイルが上書きされないよう回ごとに分ける）
+        self.runs_dir = self.log_dir / f"runs_{vehicles}v_{av_penetration}av_{self.start_time.strftime('%Y%m%d_%H%M%S')}"
+        
         print(f"🔄 複数回実行分析システム初期化")
         print(f"📊 パラメータ: 車両数{vehicles}台, AV普及率{av_penetration}%")
         print(f"🔢 実行回数: {num_runs}回")
         print(f"🎲 ランダムシード: 自動変更")
+        print(f"⚙️ 同時実行数: {self.jobs}")
+        cpu_count = os.cpu_count() or 1
+        if self.jobs > cpu_count:
+            print(f"ℹ️ 同時実行数がCPUコア数({cpu_count})を超えています（各回の処理が遅くなる場合があります）")
         
     def ensure_directories(self):
         """必要なディレクトリの存在確認"""
@@ -67,6 +237,10 @@ class MultipleRunAnalyzer:
             
         return True
     
+    def run_label(self, run_number):
+        """同時実行時に出力行がどの回のものか分かるよう先頭に付けるラベル"""
+        return f"[{run_number}/{self.num_runs}] "
+    
     def run_single_simulation(self, run_number):
         """
         単一シミュレーション実行
@@ -77,18 +251,26 @@ class MultipleRunAnalyzer:
         Returns:
             tuple: (総停止回数, ガソリン車CO2排出量, 実行時間) または None
         """
-        print(f"\n🚀 {run_number}回目実行開始...")
+        label = self.run_label(run_number)
+        log_line(f"{label}🚀 実行開始...")
+        
+        run_dir = self.runs_dir / f"run_{run_number}"
+        run_dir.mkdir(parents=True, exist_ok=True)
         
         # コマンド構築
         cmd = [
             "python", str(self.integrated_monitor_script),
             "--config", str(self.config_file),
             "--vehicles", str(self.vehicles),
-            "--av-penetration", str(self.av_penetration)
+            "--av-penetration", str(self.av_penetration),
+            "--output-dir", str(run_dir)
         ]
+        if self.quiet:
+            cmd.append("--quiet")  # 出力は捨てるので子プロセス側でも状況表示を組み立てない
         
         # デバッグ：実行コマンド表示
-        print(f"🔧 実行コマンド: {' '.join(cmd)}")
+        if self.verbose:
+            log_line(f"{label}🔧 実行コマンド: {' '.join(cmd)}")
         
         start_time = time.time()
         
@@ -98,111 +280,96 @@ class MultipleRunAnalyzer:
             env['PYTHONIOENCODING'] = 'utf-8'
             
             # 実行
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True, 
-                encoding='utf-8',
-                errors='replace',   # エンコーディングエラーを置換
-                timeout=300,  # 5分タイムアウト
-                env=env  # 環境変数を渡す
-            )
+            returncode, output_tail = self.run_process(cmd, env)
             
             execution_time = time.time() - start_time
             
             # 実行結果の判定：エラーコードだけでなくファイル生成も確認
-            stop_count, co2_emission = self.parse_results()
+            stop_count, co2_emission = self.parse_results(run_dir, run_number)
             
-            if result.returncode != 0:
-                print(f"⚠️ {run_number}回目プロセスエラー（戻り値: {result.returncode}）")
+            if returncode != 0:
+                log_line(f"{label}⚠️ プロセスエラー（戻り値: {returncode}）")
                 # ただし、結果ファイルが生成されていれば成功とみなす
                 if stop_count is not None and co2_emission is not None:
-                    print(f"✅ {run_number}回目結果取得成功: 停止{stop_count}回, CO2={co2_emission:.1f}g, 時間{execution_time:.1f}s")
+                    log_line(f"{label}✅ 結果取得成功: 停止{stop_count}回, CO2={co2_emission:.1f}g, 時間{execution_time:.1f}s")
                     return stop_count, co2_emission, execution_time
                 else:
-                    stdout_msg = result.stdout[-200:] if result.stdout else "出力なし"
-                    stderr_msg = result.stderr[-200:] if result.stderr else "エラー出力なし"
-                    print(f"   stdout: {stdout_msg}")
-                    print(f"   stderr: {stderr_msg}")
+                    if output_tail:
+                        # 他の回の出力と混ざらないよう、各行にラベルを付けて1回で書き出す
+                        log_line(f"{label}   出力（末尾{len(output_tail)}行）:\n"
+                                 + "".join(f"{label}   {line}" for line in output_tail).rstrip("\n"))
+                    else:
+                        log_line(f"{label}   出力なし" + ("（--quiet）" if self.quiet else ""))
                     return None
             else:
                 # 正常終了
                 if stop_count is not None and co2_emission is not None:
-                    print(f"✅ {run_number}回目完了: 停止{stop_count}回, CO2={co2_emission:.1f}g, 時間{execution_time:.1f}s")
+                    log_line(f"{label}✅ 完了: 停止{stop_count}回, CO2={co2_emission:.1f}g, 時間{execution_time:.1f}s")
                     return stop_count, co2_emission, execution_time
                 else:
-                    print(f"⚠️ {run_number}回目結果解析失敗")
+                    log_line(f"{label}⚠️ 結果解析失敗")
                     return None
                 
         except subprocess.TimeoutExpired:
-            print(f"⏰ {run_number}回目タイムアウト（5分超過）")
+            log_line(f"{label}⏰ タイムアウト（{SIMULATION_TIMEOUT}秒超過）")
             return None
         except Exception as e:
-            print(f"❌ {run_number}回目実行エラー: {e}")
+            log_line(f"{label}❌ 実行エラー: {e}")
             return None
     
-    def parse_results(self):
+    def run_process(self, cmd, env):
         """
-        結果ファイルから数値を抽出
+        サブプロセスを実行し、出力は末尾の数行だけ保持する
+        
+        出力全体をメモリに溜めず1行ずつ読み捨てるので、長時間の実行でも
+        メモリ使用量が増えず、パイプが詰まって止まることもない。
         
         Returns:
-            tuple: (総停止回数, ガソリン車CO2排出量) または (None, None)
+            tuple: (戻り値, 出力末尾の行のdeque)
         """
-        stop_count = None
-        co2_emission = None
-        
-        # ファイル存在確認とデバッグ情報
-        stop_file = self.log_dir / "stop_count_results.txt"
-        co2_file = self.log_dir / "co2_emission_report.txt"
-        csv_file = self.log_dir / "co2_emission_log.csv"
-        
-        print(f"🔍 ファイル確認: 停止={stop_file.exists()}, CO2={co2_file.exists()}, CSV={csv_file.exists()}")
-        
-        # 停止回数を解析
-        if stop_file.exists():
-            try:
-                with open(stop_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # "総停止回数: XXX 回" を検索
-                    match = re.search(r'総停止回数:\s*(\d+)\s*回', content)
-                    if match:
-                        stop_count = int(match.group(1))
-                        print(f"✅ 停止回数抽出成功: {stop_count}回")
-                    else:
-                        print("⚠️ 停止回数パターンが見つかりません")
-            except Exception as e:
-                print(f"⚠️ 停止回数解析エラー: {e}")
-        
-        # CO2排出量を解析
-        if co2_file.exists():
+        output_tail = deque(maxlen=OUTPUT_TAIL_LINES)
+        timed_out = []
+        
+        with subprocess.Popen(
+            cmd,
+            stdout=subprocess.DEVNULL if self.quiet else subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            encoding='utf-8',
+            errors='replace',   # エンコーディングエラーを置換
+            env=env  # 環境変数を渡す
+        ) as process:
+            def kill_on_timeout():
+                timed_out.append(True)
+                process.kill()
+            
+            # 出力を読み切るまでブロックするため、タイムアウトはタイマーで強制終了する
+            timer = threading.Timer(SIMULATION_TIMEOUT, kill_on_timeout)
+            timer.start()
             try:
-                with open(co2_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    # "🔴 ガソリン車総排出量: XXX.XX g" を検索
-                    match = re.search(r'ガソリン車総排出量:\s*([\d.]+)\s*g', content)
-                    if match:
-                        co2_emission = float(match.group(1))
-                        print(f"✅ CO2排出量抽出成功: {co2_emission:.1f}g")
-                    else:
-                        print("⚠️ CO2排出量パターンが見つかりません")
-            except Exception as e:
-                print(f"⚠️ CO2排出量解析エラー: {e}")
+                if process.stdout is not None:
+                    output_tail.extend(process.stdout)
+                returncode = process.wait()
+            finally:
+                timer.cancel()
+        
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, SIMULATION_TIMEOUT)
+        return returncode, output_tail
+    
+    def parse_results(self, run_dir, run_number=None):
+        """
+        結果ファイルから数値を抽出
         
-        # CSV からの代替解析（メインファイルが失敗した場合）
-        if co2_emission is None and csv_file.exists():
-            try:
-                with open(csv_file, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    rows = list(reader)
-                    if rows:
-                        # 最終行の累積ガソリン車CO2
-                        last_row = rows[-1]
-                        co2_emission = float(last_row['total_gasoline'])
-                        print(f"✅ CSV からCO2排出量抽出: {co2_emission:.1f}g")
-            except Exception as e:
-                print(f"⚠️ CSV CO2解析エラー: {e}")
-        
-        return stop_count, co2_emission
+        Args:
+            run_dir (Path): 対象回の出力ディレクトリ
+            run_number (int): 実行回数（表示のラベル用、省略可）
+            
+        Returns:
+            tuple: (総停止回数, ガソリン車CO2排出量) または (None, None)
+        """
+        prefix = self.run_label(run_number) if run_number is not None else ""
+        return parse_run_dir(str(Path(run_dir).resolve()), self.verbose, prefix)
     
     def run_multiple_simulations(self):
         """複数回シミュレーション実行"""
@@ -213,9 +380,17 @@ class MultipleRunAnalyzer:
         if not self.ensure_directories():
             return False
         
-        # 各回実行
+        # 各回実行（各回は独立したサブプロセスなので jobs 個ずつ同時に走らせる）
+        run_results = {}
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {executor.submit(self.run_single_simulation, run_num): run_num
+                       for run_num in range(1, self.num_runs + 1)}
+            for future in as_completed(futures):
+                run_results[futures[future]] = future.result()
+        
+        # 統計・レポートは実行回の順に並べる
         for run_num in range(1, self.num_runs + 1):
-            result = self.run_single_simulation(run_num)
+            result = run_results[run_num]
             
             if result is not None:
                 stop_count, co2_emission, exec_time = result
@@ -253,29 +428,9 @@ class MultipleRunAnalyzer:
         stats = {
             'valid_runs': len(valid_results),
             'total_runs': self.num_runs,
-            'stop_count': {
-                'values': stop_counts,
-                'mean': statistics.mean(stop_counts),
-                'stdev': statistics.stdev(stop_counts) if len(stop_counts) > 1 else 0.0,
-                'min': min(stop_counts),
-                'max': max(stop_counts),
-                'median': statistics.median(stop_counts)
-            },
-            'co2_emission': {
-                'values': co2_emissions,
-                'mean': statistics.mean(co2_emissions),
-                'stdev': statistics.stdev(co2_emissions) if len(co2_emissions) > 1 else 0.0,
-                'min': min(co2_emissions),
-                'max': max(co2_emissions),
-                'median': statistics.median(co2_emissions)
-            },
-            'execution_time': {
-                'values': exec_times,
-                'mean': statistics.mean(exec_times),
-                'stdev': statistics.stdev(exec_times) if len(exec_times) > 1 else 0.0,
-                'min': min(exec_times),
-                'max': max(exec_times)
-            }
+            'stop_count': summarize_values(stop_counts),
+            'co2_emission': summarize_values(co2_emissions),
+            'execution_time': summarize_values(exec_times, with_median=False)
         }
         
         return stats
@@ -295,7 +450,7 @@ class MultipleRunAnalyzer:
         # 詳細レポート作成
         total_analysis_time = (datetime.now() - self.start_time).total_seconds()
         
-        report = f"""複数回実行統計分析結果
+        parts = [f"""複数回実行統計分析結果
 
 実行設定:
 - 総車両数: {self.vehicles} 台
@@ -310,18 +465,18 @@ class MultipleRunAnalyzer:
 {"="*60}
 停止回数統計:
 {"="*60}
-"""
+"""]
         
         # 個別結果表示
         for i, result in enumerate(self.results, 1):
             if result['stop_count'] is not None:
-                report += f"{i:2d}回目: {result['stop_count']:3d} 回 (実行時間: {result['execution_time']:5.1f}s)\n"
+                parts.append(f"{i:2d}回目: {result['stop_count']:3d} 回 (実行時間: {result['execution_time']:5.1f}s)\n")
             else:
-                report += f"{i:2d}回目: --- 回 (実行失敗)\n"
+                parts.append(f"{i:2d}回目: --- 回 (実行失敗)\n")
         
         # 統計サマリー
         if stats['valid_runs'] > 0:
-            report += f"""
+            parts.append(f"""
 統計サマリー:
 - 平均値: {stats['stop_count']['mean']:6.1f} 回
 - 標準偏差: {stats['stop_count']['stdev']:6.1f} 回
@@ -332,17 +487,17 @@ class MultipleRunAnalyzer:
 {"="*60}
 ガソリン車CO2排出量統計:
 {"="*60}
-"""
+""")
             
             # CO2個別結果
             for i, result in enumerate(self.results, 1):
                 if result['co2_emission'] is not None:
-                    report += f"{i:2d}回目: {result['co2_emission']:8.1f} g (実行時間: {result['execution_time']:5.1f}s)\n"
+                    parts.append(f"{i:2d}回目: {result['co2_emission']:8.1f} g (実行時間: {result['execution_time']:5.1f}s)\n")
                 else:
-                    report += f"{i:2d}回目: -----.-- g (実行失敗)\n"
+                    parts.append(f"{i:2d}回目: -----.-- g (実行失敗)\n")
             
             # CO2統計サマリー
-            report += f"""
+            parts.append(f"""
 統計サマリー:
 - 平均値: {stats['co2_emission']['mean']:8.1f} g
 - 標準偏差: {stats['co2_emission']['stdev']:8.1f} g
@@ -365,25 +520,27 @@ class MultipleRunAnalyzer:
 CO2排出量の変動係数: {(stats['co2_emission']['stdev'] / stats['co2_emission']['mean'] * 100):5.1f}%
 
 分析結果:
-"""
+""")
             
             # 変動性の評価
             stop_cv = stats['stop_count']['stdev'] / stats['stop_count']['mean'] * 100
             co2_cv = stats['co2_emission']['stdev'] / stats['co2_emission']['mean'] * 100
             
             if stop_cv < 5:
-                report += "- 停止回数は非常に安定しています\n"
+                parts.append("- 停止回数は非常に安定しています\n")
             elif stop_cv < 10:
-                report += "- 停止回数は比較的安定しています\n"
+                parts.append("- 停止回数は比較的安定しています\n")
             else:
-                report += "- 停止回数にばらつきが見られます\n"
+                parts.append("- 停止回数にばらつきが見られます\n")
             
             if co2_cv < 5:
-                report += "- CO2排出量は非常に安定しています\n"
+                parts.append("- CO2排出量は非常に安定しています\n")
             elif co2_cv < 10:
-                report += "- CO2排出量は比較的安定しています\n"
+                parts.append("- CO2排出量は比較的安定しています\n")
             else:
-                report += "- CO2排出量にばらつきが見られます\n"
+                parts.append("- CO2排出量にばらつきが見られます\n")
+        
+        report = "".join(parts)
         
         # ログファイル保存
         try:
@@ -393,38 +550,41 @@ CO2排出量の変動係数: {(stats['co2_emission']['stdev'] / stats['co2_emiss
         except Exception as e:
             print(f"⚠️ ログ保存エラー: {e}")
         
-        # CSV保存
+        # CSV保存（全行をリストにまとめて writerows で一括書き出し）
+        rows = [['Run', 'StopCount', 'GasolineCO2_g', 'ExecutionTime_s', 'Status']]
+        rows.extend(
+            [
+                result['run'],
+                result['stop_count'] if result['stop_count'] is not None else '',
+                result['co2_emission'] if result['co2_emission'] is not None else '',
+                result['execution_time'] if result['execution_time'] is not None else '',
+                'Success' if result['stop_count'] is not None else 'Failed'
+            ]
+            for result in self.results
+        )
+        
+        # 統計行追加
+        if stats['valid_runs'] > 0:
+            rows.extend([
+                [],  # 空行
+                ['Statistics', 'StopCount', 'GasolineCO2_g', 'ExecutionTime_s', ''],
+                ['Mean', f"{stats['stop_count']['mean']:.1f}", 
+                 f"{stats['co2_emission']['mean']:.1f}", 
+                 f"{stats['execution_time']['mean']:.1f}", ''],
+                ['StdDev', f"{stats['stop_count']['stdev']:.1f}", 
+                 f"{stats['co2_emission']['stdev']:.1f}", 
+                 f"{stats['execution_time']['stdev']:.1f}", ''],
+                ['Min', stats['stop_count']['min'], 
+                 f"{stats['co2_emission']['min']:.1f}", 
+                 f"{stats['execution_time']['min']:.1f}", ''],
+                ['Max', stats['stop_count']['max'], 
+                 f"{stats['co2_emission']['max']:.1f}", 
+                 f"{stats['execution_time']['max']:.1f}", '']
+            ])
+        
         try:
-            with open(csv_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Run', 'StopCount', 'GasolineCO2_g', 'ExecutionTime_s', 'Status'])
-                
-                for result in self.results:
-                    status = 'Success' if result['stop_count'] is not None else 'Failed'
-                    writer.writerow([
-                        result['run'],
-                        result['stop_count'] if result['stop_count'] is not None else '',
-                        result['co2_emission'] if result['co2_emission'] is not None else '',
-                        result['execution_time'] if result['execution_time'] is not None else '',
-                        status
-                    ])
-                
-                # 統計行追加
-                if stats['valid_runs'] > 0:
-                    writer.writerow([])  # 空行
-                    writer.writerow(['Statistics', 'StopCount', 'GasolineCO2_g', 'ExecutionTime_s', ''])
-                    writer.writerow(['Mean', f"{stats['stop_count']['mean']:.1f}", 
-                                   f"{stats['co2_emission']['mean']:.1f}", 
-                                   f"{stats['execution_time']['mean']:.1f}", ''])
-                    writer.writerow(['StdDev', f"{stats['stop_count']['stdev']:.1f}", 
-                                   f"{stats['co2_emission']['stdev']:.1f}", 
-                                   f"{stats['execution_time']['stdev']:.1f}", ''])
-                    writer.writerow(['Min', stats['stop_count']['min'], 
-                                   f"{stats['co2_emission']['min']:.1f}", 
-                                   f"{stats['execution_time']['min']:.1f}", ''])
-                    writer.writerow(['Max', stats['stop_count']['max'], 
-                                   f"{stats['co2_emission']['max']:.1f}", 
-                                   f"{stats['execution_time']['max']:.1f}", ''])
+            with open(csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 16) as f:
+                csv.writer(f).writerows(rows)
             
             print(f"📊 CSV データ保存: {csv_path}")
             
@@ -470,6 +630,12 @@ def main():
                        help='AV普及率%% (0-100)')
     parser.add_argument('--runs', type=int, default=3,
                        help='実行回数 (デフォルト: 3)')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help=f'同時実行数 (デフォルト: 1, CPUコア数: {os.cpu_count()})')
+    parser.add_argument('--quiet', action='store_true',
+                       help='シミュレーションの出力を破棄（失敗時の出力表示もなし）')
+    parser.add_argument('--verbose', action='store_true',
+                       help='実行コマンドや結果ファイルの解析状況を表示')
     
     args = parser.parse_args()
     
@@ -485,9 +651,13 @@ def main():
     if args.runs <= 0:
         print("❌ 実行回数は1以上である必要があります")
         return
+        
+    if args.jobs <= 0:
+        print("❌ 同時実行数は1以上である必要があります")
+        return
     
     # 分析実行
-    analyzer = MultipleRunAnalyzer(args.vehicles, args.av_penetration, args.runs)
+    analyzer = MultipleRunAnalyzer(args.vehicles, args.av_penetration, args.runs, args.jobs, args.quiet, args.verbose)
     
     if analyzer.run_multiple_simulations():
         stats = analyzer.calculate_statistics()
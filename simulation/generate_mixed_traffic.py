@@ -63,41 +63,61 @@ def check_sumo_environment():
     
     return True
 
-def create_manual_trips(network_file, total_vehicles, end_time, output_file):
-    """手動でトリップファイルを作成"""
-    try:
-        # ネットワークファイルからエッジ情報を読み取り
-        tree = ET.parse(network_file)
-        root = tree.getroot()
-        
-        # 利用可能なエッジを取得
-        edges = []
-        for edge in root.findall('edge'):
-            edge_id = edge.get('id')
+def get_edges_from_network(network_file):
+    """
+    ネットワークファイルから利用可能なエッジIDを取得（内部エッジ・逆方向エッジは除外）
+    
+    ファイル全体のツリーは作らず、iterparseで最上位要素を1つ読むごとに破棄する
+    （レーン・接続・交差点などが大量にあってもメモリ使用量が増えない）
+    """
+    edges = []
+    depth = 0
+    context = ET.iterparse(network_file, events=('start', 'end'))
+    _, root = next(context)
+    for event, elem in context:
+        if event == 'start':
+            depth += 1
+            continue
+        depth -= 1
+        if depth > 0:
+            continue  # エッジ内のレーンなどは親要素の処理時にまとめて破棄
+        if elem.tag == 'edge':
+            edge_id = elem.get('id')
             # 内部エッジや特殊エッジを除外
             if edge_id and not edge_id.startswith(':') and not edge_id.startswith('-'):
                 edges.append(edge_id)
+        root.clear()
+    return edges
+
+def create_manual_trips(network_file, total_vehicles, end_time, output_file):
+    """手動でトリップファイルを作成"""
+    try:
+        # ネットワークファイルから利用可能なエッジを取得
+        edges = get_edges_from_network(network_file)
         
         if len(edges) < 2:
             print("❌ 利用可能なエッジが不足しています")
             return False
         
-        # 手動トリップファイル作成
-        trips_content = '<?xml version="1.0" encoding="UTF-8"?>\n<trips>\n'
-        
-        for i in range(total_vehicles):
-            # ランダムに出発地と目的地を選択
-            from_edge = random.choice(edges)
-            to_edge = random.choice([e for e in edges if e != from_edge])
-            # 出発時間の分散
-            depart_time = random.uniform(0, end_time * 0.8)  # 80%の時間内にランダム出発
+        # 手動トリップファイル作成（全体を1つの文字列にまとめず、64KBバッファ経由で1行ずつ書き出す）
+        choice = random.choice
+        uniform = random.uniform
+        with open(output_file, 'w', encoding='utf-8', buffering=1 << 16) as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n<trips>\n')
             
-            trips_content += f'    <trip id="{i}" depart="{depart_time:.1f}" from="{from_edge}" to="{to_edge}"/>\n'
-        
-        trips_content += '</trips>\n'
-        
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(trips_content)
+            for i in range(total_vehicles):
+                # ランダムに出発地と目的地を選択
+                from_edge = choice(edges)
+                # 除外するのは出発地の1本だけなので、車両ごとに候補リストを作らず引き直す
+                to_edge = choice(edges)
+                while to_edge == from_edge:
+                    to_edge = choice(edges)
+                # 出発時間の分散
+                depart_time = uniform(0, end_time * 0.8)  # 80%の時間内にランダム出発
+                
+                f.write(f'    <trip id="{i}" depart="{depart_time:.1f}" from="{from_edge}" to="{to_edge}"/>\n')
+            
+            f.write('</trips>\n')
         
         print(f"✅ 手動トリップファイル '{output_file}' を作成しました")
         return True